@@ -37,4 +37,12 @@ def get_config():
     """Deal with all the configy bits"""
     import os
     hostname = os.environ.get('REDBIOM_HOST', 'http://qiita.ucsd.edu:7329')
-    return {'hostname': hostname}
+
+    # an optional directory to cache static data, such as taxonomy, locally
+    cache_dir = os.environ.get('REDBIOM_CACHE_DIR', None)
+
+    # an optional bound, in megabytes, on responses to read commands cached
+    # under the cache directory
+    http_cache_size = int(os.environ.get('REDBIOM_HTTP_CACHE_SIZE', 0))
+    return {'hostname': hostname, 'cache_dir': cache_dir,
+            'http_cache_size': http_cache_size}
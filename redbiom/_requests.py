@@ -39,19 +39,10 @@ def make_post(config, redis_protocol=None):
         # information can be found here:
         # https://redis.io/topics/mass-insert
         def f(context, cmd, payload):
-            import sys
             args = payload.split('/')
             args[0] = ':'.join([context, args[0]])
             args.insert(0, cmd)
-
-            # https://gist.github.com/laserson/2689744
-            proto = ''
-            proto += '*' + str(len(args)) + '\r\n'
-            for arg in args:
-                proto += '$' + str(len(bytes(str(arg), 'utf-8'))) + '\r\n'
-                proto += str(arg) + '\r\n'
-            sys.stdout.write(proto)
-            sys.stdout.flush()
+            write_resp(args)
     else:
         def f(context, cmd, payload):
             req = s.post(config['hostname'],
@@ -60,26 +51,161 @@ def make_post(config, redis_protocol=None):
     return f
 
 
-def make_put(config):
+# commands in the native protocol pending output, see write_resp
+_resp_buffer = bytearray()
+_resp_pending_at_exit = []
+
+# where commands in the native protocol are written, stdout if None
+_resp_output = [None]
+
+# the number of bytes of commands to hold prior to output
+RESP_BUFFER_SIZE = 2 ** 20
+
+
+def write_resp(args):
+    """Buffer a command in the native protocol for output
+
+    Parameters
+    ----------
+    args : list
+        The command followed by its arguments. Arguments which are not bytes
+        are encoded as UTF-8.
+
+    Notes
+    -----
+    Commands are written to stdout in large chunks, and any which are
+    pending are written on exit. See flush_resp().
+    """
+    if not _resp_pending_at_exit:
+        import atexit
+        atexit.register(flush_resp)
+        _resp_pending_at_exit.append(True)
+
+    # https://gist.github.com/laserson/2689744
+    buf = _resp_buffer
+    buf += b'*%d\r\n' % len(args)
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = (u'%s' % arg).encode('utf-8')
+        buf += b'$%d\r\n' % len(arg)
+        buf += arg
+        buf += b'\r\n'
+
+    if len(buf) >= RESP_BUFFER_SIZE:
+        flush_resp()
+
+
+def flush_resp():
+    """Write out the pending commands in the native protocol"""
+    import sys
+
+    if not _resp_buffer:
+        return
+
+    out = _resp_output[0]
+    if out is None:
+        out = getattr(sys.stdout, 'buffer', sys.stdout)
+    out.write(bytes(_resp_buffer))
+    out.flush()
+    del _resp_buffer[:]
+
+
+def set_resp_output(fp):
+    """Direct commands in the native protocol to a file
+
+    Parameters
+    ----------
+    fp : file-like, or None
+        A binary file to write to. If None, commands are written to stdout.
+
+    Returns
+    -------
+    file-like, or None
+        The prior output.
+    """
+    flush_resp()
+    previous = _resp_output[0]
+    _resp_output[0] = fp
+    return previous
+
+
+def make_bulk_post(config, redis_protocol=None, max_args=1000):
+    """Factory function: produce a bulk_post() method
+
+    The produced method accepts a context and a list of (command, key, args)
+    tuples, where command is either SADD or HMSET. Over HTTP, the commands are
+    grouped and issued through the bulk-write script, so many keys are written
+    per request. With redis_protocol, the commands are written out in the
+    native protocol.
+    """
+    # keep the number of arguments per command even so HMSET pairs are
+    # not split across records
+    step = max_args // 2 - (max_args // 2) % 2
+
+    if redis_protocol:
+        def f(context, commands):
+            for cmd, key, args in commands:
+                args = list(args)
+                for start in range(0, len(args), step):
+                    chunk = args[start:start + step]
+                    write_resp([cmd, ':'.join([context, key])] + chunk)
+    else:
+        import redbiom.admin
+        se = make_script_exec(config)
+
+        def f(context, commands):
+            sha = redbiom.admin.ScriptManager.get('bulk-write')
+            batch = []
+            for cmd, key, args in commands:
+                args = [str(a) for a in args]
+                for start in range(0, len(args), step):
+                    chunk = args[start:start + step]
+                    if batch and len(batch) + len(chunk) + 3 > max_args:
+                        se(sha, 0, context, *batch)
+                        batch = []
+                    batch.extend([cmd, key, str(len(chunk))])
+                    batch.extend(chunk)
+            if batch:
+                se(sha, 0, context, *batch)
+    return f
+
+
+def make_put(config, redis_protocol=None):
     """Factory function: produce a put() method
 
     Within Webdis, PUT is generally used to provide content in the body for
-    use as a file upload.
+    use as a file upload. With redis_protocol, the command is written out in
+    the native protocol.
     """
     import redbiom
     s = get_session()
     config = redbiom.get_config()
 
-    def f(context, cmd, key, data):
-        url = '/'.join([config['hostname'],
-                        _format_request(context, cmd, key)])
-        req = s.put(url, data=data)
-        return _parse_validate_request(req, cmd)
+    if redis_protocol:
+        def f(context, cmd, key, data):
+            write_resp([cmd, ':'.join([context, key]), data])
+    else:
+        def f(context, cmd, key, data):
+            url = '/'.join([config['hostname'],
+                            _format_request(context, cmd, key)])
+            req = s.put(url, data=data)
+            return _parse_validate_request(req, cmd)
     return f
 
 
-def make_get(config):
-    """Factory function: produce a get() method"""
+def make_get(config, cache=True):
+    """Factory function: produce a get() method
+
+    If a cache directory and an HTTP cache size are configured, and cache is
+    True, responses are cached on disk. Cached responses are keyed by the
+    host and by the generation of the database, which admin methods
+    increment on modification.
+
+    The generation is read once, on the first request of the produced
+    method, so a getter observes a consistent view of the database for its
+    lifetime and does not observe modifications made after its first
+    request. Long lived callers should obtain a new getter to observe them.
+    """
     import redbiom
     s = get_session()
     config = redbiom.get_config()
@@ -88,6 +214,111 @@ def make_get(config):
         payload = _format_request(context, cmd, data)
         url = '/'.join([config['hostname'], payload])
         return _parse_validate_request(s.get(url), cmd)
+
+    cached = _make_generation_cache(config, f) if cache else None
+    if cached is None:
+        return f
+
+    def cached_f(context, cmd, data):
+        return cached((context, cmd, data), lambda: f(context, cmd, data))
+    return cached_f
+
+
+def _make_generation_cache(config, get):
+    """Produce a method to cache responses within a database generation
+
+    The produced method accepts a key and a method to compute the response
+    on a miss, see _make_response_cache. The key is qualified by the host and
+    by the generation of the database, which is read with get on the first
+    request. None is returned if a cache is not configured.
+    """
+    if not (config.get('cache_dir') and config.get('http_cache_size')):
+        return None
+
+    cached = _make_response_cache(config['cache_dir'],
+                                  config['http_cache_size'] * 2 ** 20)
+    generation = []
+
+    def f(key, compute):
+        if not generation:
+            generation.append(get('state', 'GET', 'generation') or '0')
+        return cached([config['hostname'], generation[0]] + list(key),
+                      compute)
+    return f
+
+
+def _make_response_cache(cache_dir, max_size):
+    """Produce a method to obtain responses through a size bounded disk cache
+
+    The produced method accepts a key, which must be JSON serializable, and a
+    method to compute the response on a miss. Files are evicted in least
+    recently used order, as tracked by their modification time, once the
+    size of the cache exceeds max_size bytes.
+    """
+    import os
+    import json
+    import hashlib
+
+    path = os.path.join(cache_dir, 'http')
+    size = []
+
+    def evict():
+        entries = []
+        for name in os.listdir(path):
+            try:
+                stat = os.stat(os.path.join(path, name))
+            except OSError:
+                # removed by a concurrent process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(entry[1] for entry in entries)
+        for _, nbytes, name in sorted(entries):
+            if total <= max_size:
+                break
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+            total -= nbytes
+        return total
+
+    def f(key, compute):
+        digest = hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
+        fp_path = os.path.join(path, digest)
+
+        try:
+            with open(fp_path) as fp:
+                result = json.load(fp)
+        except (IOError, OSError, ValueError):
+            pass
+        else:
+            # note the use for eviction
+            try:
+                os.utime(fp_path, None)
+            except OSError:
+                pass
+            return result
+
+        result = compute()
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        # write then rename so concurrent readers do not observe a partial
+        # file
+        tmp = '%s.%d' % (fp_path, os.getpid())
+        with open(tmp, 'w') as fp:
+            json.dump(result, fp)
+        nbytes = os.path.getsize(tmp)
+        os.rename(tmp, fp_path)
+
+        if not size:
+            size.append(evict())
+        else:
+            size[0] += nbytes
+            if size[0] > max_size:
+                size[0] = evict()
+        return result
     return f
 
 
@@ -104,19 +335,55 @@ def make_delete(config):
     return f
 
 
-def make_script_exec(config):
-    """Factory function: produce a script_exec() method"""
+def make_script_exec(config, cache=False):
+    """Factory function: produce a script_exec() method
+
+    If cache is True, and a cache is configured, results are cached on disk
+    as with make_get. Only scripts which do not modify the database should
+    be cached.
+    """
     import redbiom
     import json
+    import requests
     s = get_session()
     config = redbiom.get_config()
 
     def f(sha, *args):
+        import redbiom.admin
         payload = [config['hostname'], 'EVALSHA', sha]
         payload.extend([str(a) for a in args])
         url = '/'.join(payload)
-        return json.loads(_parse_validate_request(s.get(url), 'EVALSHA'))
-    return f
+        result = _parse_validate_request(s.get(url), 'EVALSHA')
+
+        # the script cache of Redis is not persisted, so following a restart
+        # the script is loaded again and the command retried
+        if _is_noscript(result) and redbiom.admin.ScriptManager.reload(sha):
+            result = _parse_validate_request(s.get(url), 'EVALSHA')
+
+        # errors are represented by webdis as [false, message] while the
+        # scripts return JSON
+        if isinstance(result, list):
+            raise requests.HTTPError("EVALSHA : %s" % result[1])
+
+        return json.loads(result)
+
+    cached = None
+    if cache:
+        cached = _make_generation_cache(config, make_get(config, cache=False))
+    if cached is None:
+        return f
+
+    def cached_f(sha, *args):
+        key = ['EVALSHA', sha] + [str(a) for a in args]
+        return cached(key, lambda: f(sha, *args))
+    return cached_f
+
+
+def _is_noscript(result):
+    """Test if a response denotes an unknown script"""
+    if not isinstance(result, list) or len(result) != 2:
+        return False
+    return result[0] is False and result[1].startswith('NOSCRIPT')
 
 
 def buffered(it, prefix, cmd, context, get=None, buffer_size=10,
@@ -181,12 +448,188 @@ def buffered(it, prefix, cmd, context, get=None, buffer_size=10,
             yield items, get(None, cmd, bulk)
 
 
-def valid(context, get=None):
-    """Test if a context exists"""
-    if get is None:
+def scan_set(get, context, key, pattern, count=1000):
+    """Iterate over the members of a set which match a pattern
+
+    Parameters
+    ----------
+    get : function
+        A get method.
+    context : string
+        The context of the set.
+    key : string
+        The key of the set within the context.
+    pattern : string
+        A glob style pattern.
+    count : int, optional
+        The amount of work per request, see SSCAN.
+
+    Notes
+    -----
+    As with SSCAN, a member may be yielded more than once.
+
+    Redis command summary
+    ---------------------
+    SSCAN <context>:<key> <cursor> MATCH <pattern> COUNT <count>
+    """
+    cursor = '0'
+    while True:
+        cursor, members = get(context, 'SSCAN', '%s/%s/MATCH/%s/COUNT/%d' %
+                              (key, cursor, pattern, count))
+        for member in members:
+            yield member
+        if cursor == '0':
+            break
+
+
+# database state which is stable over the life of a process, see state()
+_state = {}
+
+
+def state(get=None, refresh=False):
+    """Obtain the contexts and script SHA1s of the database
+
+    Parameters
+    ----------
+    get : a make_get instance, optional
+        A constructed get method.
+    refresh : bool, optional
+        If True, discard the state held by the process and obtain it again.
+
+    Notes
+    -----
+    The state is obtained on first use and held for the life of the process.
+    Admin methods which modify the state reset it. The state of each context
+    is obtained with it, see context_state(), in a single request if the
+    bootstrap-state script is available.
+
+    Returns
+    -------
+    dict
+        {'contexts': {name: description}, 'scripts': {name: sha1}}
+
+    Redis command summary
+    ---------------------
+    EVALSHA <bootstrap-state-sha1> 0
+    HGETALL state:contexts
+    HGETALL state:scripts
+    """
+    if refresh:
+        reset_state()
+
+    if 'contexts' not in _state:
+        import hashlib
+        import requests
         import redbiom
+        import redbiom.admin
         config = redbiom.get_config()
-        get = make_get(config)
 
-    if not get('state', 'HEXISTS', 'contexts/%s' % context):
+        # the SHA1 is computed locally as the scripts are not yet known
+        script = redbiom.admin.ScriptManager._scripts['bootstrap-state']
+        sha = hashlib.sha1(script.encode('ascii')).hexdigest()
+        se = make_script_exec(config)
+        try:
+            contexts, scripts, states = se(sha, 0)
+        except requests.HTTPError:
+            # the script is not available to a read-only client which
+            # predates it
+            if get is None:
+                get = make_get(config)
+            contexts = get('state', 'HGETALL', 'contexts')
+            scripts = get('state', 'HGETALL', 'scripts')
+            states = {}
+
+        _state['contexts'] = contexts
+        _state['scripts'] = scripts
+        _state['context-state'] = states
+
+    return {'contexts': _state['contexts'], 'scripts': _state['scripts']}
+
+
+def context_state(context, get=None, refresh=False):
+    """Obtain the state of a context, such as db-version and has-taxonomy
+
+    Parameters
+    ----------
+    context : str
+        The context to obtain state for.
+    get : a make_get instance, optional
+        A constructed get method.
+    refresh : bool, optional
+        If True, obtain the state of the context again.
+
+    Notes
+    -----
+    The state of a context is held for the life of the process, and is
+    generally obtained along with the state of the database, see state().
+    As it may have been modified by another process since, use
+    context_flag() to test for a flag.
+
+    Returns
+    -------
+    dict
+        The <context>:state hash.
+
+    Redis command summary
+    ---------------------
+    HGETALL <context>:state
+    """
+    state(get)
+    per_context = _state['context-state']
+    if refresh or context not in per_context:
+        if get is None:
+            import redbiom
+            config = redbiom.get_config()
+            get = make_get(config)
+
+        per_context[context] = get(context, 'HGETALL', 'state')
+    return per_context[context]
+
+
+def context_flag(context, flag, get=None):
+    """Test if a flag, such as has-taxonomy, is set for a context
+
+    Parameters
+    ----------
+    context : str
+        The context to test.
+    flag : str
+        The field of the <context>:state hash to test for.
+    get : a make_get instance, optional
+        A constructed get method.
+
+    Notes
+    -----
+    Flags are only ever set, so a flag held by the process is trusted. A
+    flag which is not held is checked again, as it may have been set since
+    the state was obtained.
+
+    Returns
+    -------
+    bool
+        True if the flag is set.
+
+    Redis command summary
+    ---------------------
+    HGETALL <context>:state
+    """
+    if flag in context_state(context, get):
+        return True
+
+    # the flag may have been set since the state was obtained
+    return flag in context_state(context, get, refresh=True)
+
+
+def reset_state():
+    """Discard the database state held by the process"""
+    _state.clear()
+
+
+def valid(context, get=None):
+    """Test if a context exists"""
+    if context in state(get)['contexts']:
+        return
+
+    # the context may have been created since the state was obtained
+    if context not in state(get, refresh=True)['contexts']:
         raise ValueError("Unknown context: %s" % context)
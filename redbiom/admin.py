@@ -9,9 +9,23 @@ class ScriptManager:
                       redis.call('HSET', KEYS[1] .. '-inverted', kid, ARGV[1])
                     end
                     return kid""",
+                'get-indices': """
+                    local result = {}
+                    for i, key in ipairs(ARGV) do
+                      local kid = redis.call('HGET', KEYS[1], key)
+                      if not kid then
+                        kid = redis.call('HINCRBY', KEYS[1],
+                                         'current_id', 1) - 1
+                        redis.call('HSET', KEYS[1], key, kid)
+                        redis.call('HSET', KEYS[1] .. '-inverted', kid, key)
+                      end
+                      result[i] = tonumber(kid)
+                    end
+                    return cjson.encode(result)""",
                 'fetch-feature': """
                     local context = ARGV[1]
                     local key = ARGV[2]
+                    local mincount = tonumber(ARGV[3]) or 1
                     local result = {}
                     local formedkey = context .. ':' .. 'feature' .. ':' .. key
 
@@ -20,14 +34,16 @@ class ScriptManager:
                                              '0', '-1')
 
                     -- adapted from https://gist.github.com/klovadis/5170446
-                    local resultkey
+                    -- items are index/count pairs. pairs below the minimum
+                    -- count are dropped before the index is resolved.
                     local ii = context .. ':' .. 'sample' .. '-index-inverted'
-                    for idx, v in ipairs(items) do
-                        if idx % 2 == 1 then
+                    for idx = 1, #items, 2 do
+                        local count = tonumber(items[idx + 1])
+                        if count >= mincount then
                             -- it is likely possible to issue a HMGET
-                            resultkey = redis.call('HGET', ii, v)
-                        else
-                            result[resultkey] = tonumber(v)
+                            local resultkey = redis.call('HGET', ii,
+                                                         items[idx])
+                            result[resultkey] = count
                         end
                     end
 
@@ -35,6 +51,7 @@ class ScriptManager:
                 'fetch-sample': """
                     local context = ARGV[1]
                     local key = ARGV[2]
+                    local mincount = tonumber(ARGV[3]) or 1
                     local result = {}
                     local formedkey = context .. ':' .. 'sample' .. ':' .. key
 
@@ -43,20 +60,534 @@ class ScriptManager:
                                              '0', '-1')
 
                     -- adapted from https://gist.github.com/klovadis/5170446
-                    local resultkey
+                    -- items are index/count pairs. pairs below the minimum
+                    -- count are dropped before the index is resolved.
                     local ii = context .. ':' .. 'feature' .. '-index-inverted'
-                    for idx, v in ipairs(items) do
-                        if idx % 2 == 1 then
+                    for idx = 1, #items, 2 do
+                        local count = tonumber(items[idx + 1])
+                        if count >= mincount then
                             -- it is likely possible to issue a HMGET
-                            resultkey = redis.call('HGET', ii, v)
+                            local resultkey = redis.call('HGET', ii,
+                                                         items[idx])
+                            result[resultkey] = count
+                        end
+                    end
+
+                    return cjson.encode(result)""",
+                'fetch-indices': """
+                    local context = ARGV[1]
+                    local axis = ARGV[2]
+                    local result = {}
+
+                    -- the unresolved opposite axis indices per key
+                    for i = 3, #ARGV do
+                        local formedkey = context .. ':' .. axis .. ':' ..
+                                          ARGV[i]
+                        local items = redis.call('LRANGE',
+                                                 formedkey,
+                                                 '0', '-1')
+                        local indices = {}
+                        for idx = 1, #items, 2 do
+                            indices[#indices + 1] = items[idx]
+                        end
+                        result[ARGV[i]] = indices
+                    end
+
+                    return cjson.encode(result)""",
+                'context-stats': """
+                    local contexts = redis.call('HGETALL', 'state:contexts')
+                    local result = {}
+
+                    for i = 1, #contexts, 2 do
+                        local name = contexts[i]
+                        local nsamp = redis.call('SCARD', name .. ':' ..
+                                                 'samples-represented')
+                        local nfeat = redis.call('SCARD', name .. ':' ..
+                                                 'features-represented')
+                        result[#result + 1] = {name, nsamp, nfeat,
+                                               contexts[i + 1]}
+                    end
+
+                    return cjson.encode(result)""",
+                'bootstrap-state': """
+                    local function hash(key)
+                        local items = redis.call('HGETALL', key)
+                        local result = {}
+                        for i = 1, #items, 2 do
+                            result[items[i]] = items[i + 1]
+                        end
+                        return result
+                    end
+
+                    local contexts = hash('state:contexts')
+                    local states = {}
+                    for name, _ in pairs(contexts) do
+                        states[name] = hash(name .. ':state')
+                    end
+
+                    return cjson.encode({contexts, hash('state:scripts'),
+                                         states})""",
+                'category-counts': """
+                    local counts = 'metadata:category-counts'
+                    local categories = ARGV
+                    if #categories == 0 then
+                        categories = redis.call('SMEMBERS',
+                                                'metadata:' ..
+                                                'categories-represented')
+                    end
+
+                    -- prefer the precomputed count, which may not exist
+                    -- for categories loaded prior to its introduction
+                    local result = {}
+                    for i, category in ipairs(categories) do
+                        local n = redis.call('HGET', counts, category)
+                        if not n then
+                            n = redis.call('HLEN', 'metadata:category:' ..
+                                           category)
+                        end
+                        result[i] = {category, tonumber(n)}
+                    end
+
+                    return cjson.encode(result)""",
+                'taxon-descendents': """
+                    local context = ARGV[1]
+                    local to_get = {ARGV[2]}
+                    local tips = {}
+
+                    -- use the precomputed tips if the index is complete
+                    local state = context .. ':state'
+                    if redis.call('HGET', state, 'taxon-tips') then
+                        local indexed = redis.call('SMEMBERS',
+                            context .. ':taxon-tips:' .. ARGV[2])
+                        for _, tip in ipairs(indexed) do
+                            tips[tip] = true
+                        end
+                        to_get = {}
+                    end
+
+                    -- breadth first descent of the taxonomy
+                    while #to_get > 0 do
+                        local new_to_get = {}
+                        for _, taxon in ipairs(to_get) do
+                            local children = redis.call('SMEMBERS',
+                                context .. ':taxonomy-children:' .. taxon)
+                            for _, child in ipairs(children) do
+                                if child == 'has-terminal' then
+                                    local terminal = redis.call('SMEMBERS',
+                                        context .. ':terminal-of:' .. taxon)
+                                    for _, tip in ipairs(terminal) do
+                                        tips[tip] = true
+                                    end
+                                else
+                                    new_to_get[#new_to_get + 1] = child
+                                end
+                            end
+                        end
+                        to_get = new_to_get
+                    end
+
+                    -- resolve the tip indices to feature IDs
+                    local ii = context .. ':feature-index-inverted'
+                    local names = {}
+                    local unresolved = 0
+                    for tip in pairs(tips) do
+                        local name = redis.call('HGET', ii, tip)
+                        if name then
+                            names[#names + 1] = name
+                        else
+                            unresolved = unresolved + 1
+                        end
+                    end
+
+                    return cjson.encode({names, unresolved})""",
+                'taxon-ancestors': """
+                    local context = ARGV[1]
+                    local fi = context .. ':feature-index'
+                    local tp = context .. ':taxonomy-parents'
+                    local result = {}
+                    local found = false
+
+                    for i = 2, #ARGV do
+                        -- keep the provided ID if it is not a feature, as
+                        -- it may be a taxon such as p__Firmicutes
+                        local current = redis.call('HGET', fi, ARGV[i])
+                        if not current then
+                            current = ARGV[i]
+                        end
+
+                        local lineage = {}
+                        local parent = redis.call('HGET', tp, current)
+                        while parent do
+                            found = true
+                            table.insert(lineage, 1, parent)
+                            parent = redis.call('HGET', tp, parent)
+                        end
+                        result[#result + 1] = lineage
+                    end
+
+                    return cjson.encode({result, found})""",
+                'fetch-samples-taxonomy': """
+                    local context = ARGV[1]
+                    local ii = context .. ':feature-index-inverted'
+                    local tp = context .. ':taxonomy-parents'
+                    local samples = {}
+                    local features = {}
+                    local lineages = {}
+                    local found = false
+
+                    -- lineages of internal taxa are shared, so climb each
+                    -- taxon at most once
+                    local memo = {}
+                    local function lineage_of(node)
+                        if memo[node] then
+                            return memo[node]
+                        end
+                        local lineage = {}
+                        local parent = redis.call('HGET', tp, node)
+                        if parent then
+                            found = true
+                            for _, taxon in ipairs(lineage_of(parent)) do
+                                lineage[#lineage + 1] = taxon
+                            end
+                            lineage[#lineage + 1] = parent
+                        end
+                        memo[node] = lineage
+                        return lineage
+                    end
+
+                    for i = 2, #ARGV do
+                        local formedkey = context .. ':sample:' .. ARGV[i]
+                        local items = redis.call('LRANGE',
+                                                 formedkey,
+                                                 '0', '-1')
+                        local indices = {}
+                        local counts = {}
+                        for idx = 1, #items, 2 do
+                            local index = items[idx]
+                            indices[#indices + 1] = index
+                            counts[#counts + 1] = tonumber(items[idx + 1])
+
+                            -- resolve each feature of the union only once
+                            if not features[index] then
+                                features[index] = redis.call('HGET', ii,
+                                                             index)
+                                lineages[index] = lineage_of(index)
+                            end
+                        end
+                        samples[#samples + 1] = {ARGV[i], indices, counts}
+                    end
+
+                    return cjson.encode({samples, features, lineages,
+                                         found})""",
+                'count-from': """
+                    local context = ARGV[1]
+                    local axis = ARGV[2]
+                    local mincount = tonumber(ARGV[3])
+                    local exact = ARGV[4] == '1'
+                    local as_indices = ARGV[5] == '1'
+
+                    -- gather the opposite axis indices without resolving
+                    -- them to their identifiers
+                    local found = nil
+                    for i = 6, #ARGV do
+                        local formedkey = context .. ':' .. axis .. ':' ..
+                                          ARGV[i]
+                        local items = redis.call('LRANGE',
+                                                 formedkey,
+                                                 '0', '-1')
+                        local block = {}
+                        for idx = 1, #items, 2 do
+                            if tonumber(items[idx + 1]) >= mincount then
+                                block[items[idx]] = true
+                            end
+                        end
+
+                        if found == nil then
+                            found = block
+                        elseif exact then
+                            for k in pairs(found) do
+                                if not block[k] then
+                                    found[k] = nil
+                                end
+                            end
+                        else
+                            for k in pairs(block) do
+                                found[k] = true
+                            end
+                        end
+                    end
+
+                    local result = {}
+                    local n = 0
+                    for k in pairs(found or {}) do
+                        n = n + 1
+                        result[n] = k
+                    end
+
+                    if as_indices then
+                        return cjson.encode(result)
+                    else
+                        return cjson.encode(n)
+                    end""",
+                'count-set-expr': """
+                    local prefix = ARGV[1]
+                    local stack = {}
+
+                    -- evaluate a postfix program of k:<stem> operands
+                    -- and o:<op> operators
+                    for i = 2, #ARGV do
+                        local kind = string.sub(ARGV[i], 1, 2)
+                        local value = string.sub(ARGV[i], 3)
+                        local result = {}
+                        if kind == 'k:' then
+                            local members = redis.call('SMEMBERS',
+                                                       prefix .. ':' .. value)
+                            for _, m in ipairs(members) do
+                                result[m] = true
+                            end
+                        else
+                            local right = table.remove(stack)
+                            local left = table.remove(stack)
+                            if value == 'and' then
+                                for m in pairs(left) do
+                                    if right[m] then result[m] = true end
+                                end
+                            elseif value == 'or' then
+                                for m in pairs(left) do result[m] = true end
+                                for m in pairs(right) do result[m] = true end
+                            elseif value == 'sub' then
+                                for m in pairs(left) do
+                                    if not right[m] then result[m] = true end
+                                end
+                            else
+                                for m in pairs(left) do
+                                    if not right[m] then result[m] = true end
+                                end
+                                for m in pairs(right) do
+                                    if not left[m] then result[m] = true end
+                                end
+                            end
+                        end
+                        table.insert(stack, result)
+                    end
+
+                    local n = 0
+                    for _ in pairs(stack[1] or {}) do
+                        n = n + 1
+                    end
+                    return cjson.encode(n)""",
+                'bulk-write': """
+                    -- ARGV is a context followed by a sequence of
+                    -- <command> <key> <nargs> <arg> ... <arg> records
+                    local context = ARGV[1]
+                    local allowed = {SADD = true, HMSET = true}
+                    local i = 2
+                    local written = 0
+                    while i <= #ARGV do
+                        local cmd = ARGV[i]
+                        local key = context .. ':' .. ARGV[i + 1]
+                        local n = tonumber(ARGV[i + 2])
+                        if not allowed[cmd] then
+                            return redis.error_reply('Unsupported: ' .. cmd)
+                        end
+                        local args = {}
+                        for j = 1, n do
+                            args[j] = ARGV[i + 2 + j]
+                        end
+                        redis.call(cmd, key, unpack(args))
+                        written = written + 1
+                        i = i + 3 + n
+                    end
+                    return cjson.encode(written)""",
+                'compact-features': """
+                    -- ARGV is a context followed by the features to compact
+                    local context = ARGV[1]
+                    local ii = context .. ':sample-index-inverted'
+                    local represented = context .. ':samples-represented'
+                    local removed = 0
+
+                    for i = 2, #ARGV do
+                        local formedkey = context .. ':feature:' .. ARGV[i]
+                        local items = redis.call('LRANGE',
+                                                 formedkey,
+                                                 '0', '-1')
+
+                        -- items are index/count pairs, most recent first.
+                        -- a repeated index or one whose sample is no longer
+                        -- represented is dropped.
+                        local counts = {}
+                        local indices = {}
+                        for idx = 1, #items, 2 do
+                            local index = tonumber(items[idx])
+                            if counts[index] == nil then
+                                counts[index] = false
+                                local sample = redis.call('HGET', ii,
+                                                          items[idx])
+                                if sample and redis.call('SISMEMBER',
+                                                         represented,
+                                                         sample) == 1 then
+                                    counts[index] = items[idx + 1]
+                                    indices[#indices + 1] = index
+                                end
+                            end
+                        end
+                        table.sort(indices)
+
+                        redis.call('DEL', formedkey)
+                        for start = 1, #indices, 500 do
+                            local args = {}
+                            for j = start, math.min(start + 499,
+                                                    #indices) do
+                                args[#args + 1] = indices[j]
+                                args[#args + 1] = counts[indices[j]]
+                            end
+                            redis.call('RPUSH', formedkey, unpack(args))
+                        end
+
+                        if #indices == 0 then
+                            redis.call('SREM',
+                                       context .. ':features-represented',
+                                       ARGV[i])
+                        end
+                        redis.call('SREM', context .. ':features-modified',
+                                   ARGV[i])
+                        removed = removed + (#items / 2) - #indices
+                    end
+
+                    return cjson.encode(removed)""",
+                'delete-samples': """
+                    -- ARGV is a context followed by the samples to delete
+                    local context = ARGV[1]
+                    local represented = context .. ':samples-represented'
+                    local si = context .. ':sample-index'
+                    local fii = context .. ':feature-index-inverted'
+
+                    -- the sample indices to strip per feature index
+                    local strip = {}
+                    local features = {}
+                    local deleted = 0
+                    for i = 2, #ARGV do
+                        if redis.call('SISMEMBER', represented,
+                                      ARGV[i]) == 1 then
+                            local index = redis.call('HGET', si, ARGV[i])
+                            local formedkey = context .. ':sample:' .. ARGV[i]
+                            local items = redis.call('LRANGE',
+                                                     formedkey,
+                                                     '0', '-1')
+                            for idx = 1, #items, 2 do
+                                local feature = items[idx]
+                                if not strip[feature] then
+                                    strip[feature] = {}
+                                    features[#features + 1] = feature
+                                end
+                                strip[feature][index] = true
+                            end
+                            redis.call('DEL', formedkey)
+                            redis.call('SREM', represented, ARGV[i])
+
+                            -- redbiom IDs are of the form <tag>_<sample_id>
+                            local tag = string.match(ARGV[i], '^([^_]*)_')
+                            if tag then
+                                redis.call('SREM',
+                                           context .. ':tag-members:' .. tag,
+                                           ARGV[i])
+                            end
+                            deleted = deleted + 1
+                        end
+                    end
+
+                    -- each feature list is rewritten once per block
+                    for _, feature in ipairs(features) do
+                        local id = redis.call('HGET', fii, feature)
+                        -- a feature without an index has nothing to rewrite
+                        if id then
+                            local formedkey = context .. ':feature:' .. id
+                            local items = redis.call('LRANGE',
+                                                     formedkey,
+                                                     '0', '-1')
+                            local kept = {}
+                            for idx = 1, #items, 2 do
+                                if not strip[feature][items[idx]] then
+                                    kept[#kept + 1] = items[idx]
+                                    kept[#kept + 1] = items[idx + 1]
+                                end
+                            end
+
+                            redis.call('DEL', formedkey)
+                            for start = 1, #kept, 1000 do
+                                local stop = math.min(start + 999, #kept)
+                                redis.call('RPUSH', formedkey,
+                                           unpack(kept, start, stop))
+                            end
+                            if #kept == 0 then
+                                redis.call('SREM',
+                                           context .. ':features-represented',
+                                           id)
+                                redis.call('SREM',
+                                           context .. ':features-modified', id)
+                            end
+                        end
+                    end
+
+                    return cjson.encode(deleted)""",
+                'delete-metadata': """
+                    -- ARGV are the samples whose metadata are deleted
+                    local columns = {}
+                    local touched = {}
+                    local deleted = 0
+                    for i = 1, #ARGV do
+                        local key = 'metadata:categories:' .. ARGV[i]
+                        local value = redis.call('GET', key)
+                        if value then
+                            for _, col in ipairs(cjson.decode(value)) do
+                                redis.call('HDEL', 'metadata:category:' .. col,
+                                           ARGV[i])
+                                if not touched[col] then
+                                    touched[col] = true
+                                    columns[#columns + 1] = col
+                                end
+                            end
+                            redis.call('DEL', key)
+                        end
+                        deleted = deleted + redis.call('SREM',
+                            'metadata:samples-represented', ARGV[i])
+                    end
+
+                    -- recount the categories, dropping those now empty
+                    local emptied = {}
+                    for _, col in ipairs(columns) do
+                        local n = redis.call('HLEN', 'metadata:category:' ..
+                                             col)
+                        if n == 0 then
+                            redis.call('HDEL', 'metadata:category-counts',
+                                       col)
+                            redis.call('SREM',
+                                       'metadata:categories-represented', col)
+                            emptied[#emptied + 1] = col
                         else
-                            result[resultkey] = tonumber(v)
+                            redis.call('HSET', 'metadata:category-counts',
+                                       col, n)
                         end
                     end
 
-                    return cjson.encode(result)"""}
-    _admin_scripts = ('get-index', )
-    _cache = {}
+                    return cjson.encode({deleted, emptied})""",
+                'remove-members': """
+                    -- ARGV is a sequence of <key> <nmembers> <member> ...
+                    -- records, the members of which are removed from the key
+                    local removed = 0
+                    local i = 1
+                    while i <= #ARGV do
+                        local n = tonumber(ARGV[i + 1])
+                        if n > 0 then
+                            removed = removed + redis.call('SREM', ARGV[i],
+                                unpack(ARGV, i + 2, i + 1 + n))
+                        end
+                        i = i + 2 + n
+                    end
+                    return cjson.encode(removed)"""}
+    _admin_scripts = ('get-index', 'get-indices', 'bulk-write',
+                      'compact-features', 'delete-samples', 'delete-metadata',
+                      'remove-members')
 
     @staticmethod
     def load_scripts(read_only=True):
@@ -75,7 +606,7 @@ class ScriptManager:
         config = redbiom.get_config()
         s = redbiom._requests.get_session()
         post = redbiom._requests.make_post(config)
-        get = redbiom._requests.make_get(config)
+        get = redbiom._requests.make_get(config, cache=False)
 
         for name, script in ScriptManager._scripts.items():
             if read_only and name in ScriptManager._admin_scripts:
@@ -94,6 +625,9 @@ class ScriptManager:
             obs = get('state', 'HGET', 'scripts/%s' % name)
             assert obs == sha1
 
+        redbiom._requests.reset_state()
+        _increment_generation(post)
+
     @staticmethod
     def get(name):
         """Retreive the SHA1 of a script
@@ -108,22 +642,48 @@ class ScriptManager:
         ValueError
             If the script name is not recognized
         """
-        if name in ScriptManager._cache:
-            return ScriptManager._cache[name]
-
-        import redbiom
         import redbiom._requests
-        config = redbiom.get_config()
-        get = redbiom._requests.make_get(config)
 
-        sha = get('state', 'HGET', 'scripts/%s' % name)
+        sha = redbiom._requests.state()['scripts'].get(name)
         if sha is None:
-            raise ValueError('Unknown script')
+            # the script may have been loaded since the state was obtained
+            state = redbiom._requests.state(refresh=True)
+            sha = state['scripts'].get(name)
 
-        ScriptManager._cache[name] = sha
+        if sha is None:
+            raise ValueError('Unknown script')
 
         return sha
 
+    @staticmethod
+    def reload(sha):
+        """Load a script into Redis again, such as following a restart
+
+        Parameters
+        ----------
+        sha : str
+            The SHA1 of the script to load
+
+        Returns
+        -------
+        bool
+            True if the script was recognized and loaded, False otherwise.
+        """
+        import redbiom
+        import redbiom._requests
+        import hashlib
+
+        for script in ScriptManager._scripts.values():
+            if hashlib.sha1(script.encode('ascii')).hexdigest() == sha:
+                break
+        else:
+            return False
+
+        config = redbiom.get_config()
+        s = redbiom._requests.get_session()
+        req = s.put(config['hostname'] + '/SCRIPT/LOAD', data=script)
+        return req.status_code == 200
+
     @staticmethod
     def drop_scripts():
         """Flush the loaded scripts in the redis database"""
@@ -133,7 +693,7 @@ class ScriptManager:
         s = redbiom._requests.get_session()
         s.get(config['hostname'] + '/SCRIPT/FLUSH')
         s.get(config['hostname'] + '/DEL/state:scripts')
-        ScriptManager._cache = {}
+        redbiom._requests.reset_state()
 
 
 def create_context(name, description):
@@ -152,6 +712,7 @@ def create_context(name, description):
     ----------------------
     HSET state:context <name> <description>
     HSET <context>:state db-version <current-db-version>
+    INCR state:generation
     """
     import redbiom
     import redbiom._requests
@@ -161,60 +722,401 @@ def create_context(name, description):
     post('state', 'HSET', "contexts/%s/%s" % (name, description))
     post(name, 'HSET', "state/db-version/%s" % redbiom.__db_version__)
     ScriptManager.load_scripts()
+    redbiom._requests.reset_state()
+    _increment_generation(post)
 
 
-def delete_studies_by_id(context, study_ids):
+def _increment_generation(post):
+    """Invalidate the responses cached by readers
+
+    Parameters
+    ----------
+    post : a make_post instance
+        A constructed post method.
+
+    Redis command summary
+    ---------------------
+    INCR state:generation
     """
-    Given the ID of studies, deletes those studies from
-    the redbiom database.
+    post('state', 'INCR', 'generation')
+
+
+def delete_studies_by_id(context, study_ids):
+    """Delete the samples of studies from a context
 
     Parameters
     ----------
     context : str
         The context from which to delete the studies
-    study_id : int
-        The id of the study to delete
-    delete : function
-        The delete function to use, or redbiom._requests.make_delete() is none
-        is given
+    study_ids : Iterable of int or str
+        The IDs of the studies to delete
+
+    Notes
+    -----
+    See delete_study_by_id.
+
+    Returns
+    -------
+    int
+        The number of samples deleted from the context.
+    """
+    return sum(delete_study_by_id(context, study_id)
+               for study_id in study_ids)
+
+
+def delete_study_by_id(context, study_id):
+    """Delete the samples of a study from a context
+
+    Parameters
+    ----------
+    context : str
+        The context from which to delete the study
+    study_id : int or str
+        The ID of the study to delete. Qiita sample IDs are prefixed by the
+        study ID, e.g., 10317.000001378.
+
+    Notes
+    -----
+    The sample data of every tag of the study within the context are
+    deleted. The sample metadata, both of the samples and of their tags, are
+    deleted for the samples which are then not represented in any context.
 
     Redis command summary
     ---------------------
-    DEL study_id
+    SSCAN <context>:samples-represented <cursor> MATCH *_<study_id>.*
+    SSCAN metadata:samples-represented <cursor> MATCH <study_id>.*
+    SSCAN metadata:samples-represented <cursor> MATCH *_<study_id>.*
+    SSCAN <context>:samples-represented <cursor> MATCH *_<study_id>.*
+        For each context, to determine the samples which remain represented
+    See delete_sample_data and delete_sample_metadata for the deletion.
+
+    Returns
+    -------
+    int
+        The number of samples deleted from the context.
     """
     import redbiom._requests
 
-    delete = redbiom._requests.make_delete()
-    for study_id in study_ids:
-        delete_study_by_id(context, study_id, delete)
-    return len(study_ids)
+    def members(context, get):
+        return redbiom._requests.scan_set(get, context, 'samples-represented',
+                                          '*_%s.*' % study_id)
 
+    return _delete_matching(context, members,
+                            ['%s.*' % study_id, '*_%s.*' % study_id])
 
-def delete_study_by_id(context, study_id):
+
+def delete_tag(context, tag):
+    """Delete the samples of a tag, such as a preparation, from a context
+
+    Parameters
+    ----------
+    context : str
+        The context from which to delete the tag
+    tag : str
+        The tag to delete
+
+    Notes
+    -----
+    The sample data of the tag within the context are deleted. The metadata
+    loaded with the tag are deleted if the tag is not represented in any
+    other context. The metadata of the samples themselves are retained.
+
+    The samples of the tag are obtained from <context>:tag-members:<tag>,
+    see redbiom.fetch.samples_in_context.
+
+    Redis command summary
+    ---------------------
+    SMEMBERS <context>:tag-members:<tag>
+    SSCAN metadata:samples-represented <cursor> MATCH <tag>_*
+    SMEMBERS <context>:tag-members:<tag>
+        For each context, to determine the samples which remain represented
+    See delete_sample_data and delete_sample_metadata for the deletion.
+
+    Returns
+    -------
+    int
+        The number of samples deleted from the context.
     """
-    Given the ID of a study, deletes that study from the redbiom
-    database.
+    import redbiom.fetch
+
+    def members(context, get):
+        return redbiom.fetch.samples_in_context(context, True, get, tag=tag)
+
+    return _delete_matching(context, members, ['%s_*' % tag])
+
+
+def _delete_matching(context, members, md_patterns):
+    """Delete the samples of a context, and then orphaned metadata
 
     Parameters
     ----------
     context : str
-        The context from which to delete the studies
-    study_id : int
-        The id of the study to delete
+        The context to delete from.
+    members : function
+        A function of a context and a getter, producing the redbiom IDs to
+        delete from the context.
+    md_patterns : list of str
+        Glob style patterns matching the IDs whose metadata may be deleted.
+
+    Returns
+    -------
+    int
+        The number of samples deleted from the context.
+    """
+    import redbiom
+    import redbiom._requests
+
+    config = redbiom.get_config()
+    get = redbiom._requests.make_get(config, cache=False)
+    redbiom._requests.valid(context, get)
+
+    samples = set(members(context, get))
+    n_deleted = delete_sample_data(context, samples)
+
+    # metadata are shared across contexts, and a redbiom ID carries the ID
+    # of the sample after its tag
+    candidates = set()
+    for md_pattern in md_patterns:
+        candidates.update(redbiom._requests.scan_set(
+            get, 'metadata', 'samples-represented', md_pattern))
+    remaining = set()
+    for other in redbiom._requests.state(get)['contexts']:
+        for id_ in members(other, get):
+            remaining.add(id_)
+            remaining.add(id_.split('_', 1)[1])
+    delete_sample_metadata(candidates - remaining)
+
+    return n_deleted
+
+
+def delete_sample_data(context, samples, buffer_size=250):
+    """Delete the data of samples from a context
+
+    Parameters
+    ----------
+    context : str
+        The context to delete from
+    samples : Iterable of str
+        The redbiom IDs of the samples to delete
+    buffer_size : int, optional
+        The number of samples to delete per request
+
+    Notes
+    -----
+    The list of each sample is deleted, and the entries of the samples are
+    stripped from the lists of the features they were observed in. A
+    feature list is rewritten once per block of samples. A feature left
+    without samples is removed from the features represented. The feature
+    and sample indices, and the taxonomy, are retained.
 
     Redis command summary
     ---------------------
-    DEL study_id
+    INCR state:generation
+    EVALSHA <delete-samples-sha1> 0 <context> <redbiom_id> ... <redbiom_id>
+        The script issues the following:
+        SISMEMBER <context>:samples-represented <redbiom_id>
+        HGET <context>:sample-index <redbiom_id>
+        LRANGE <context>:sample:<redbiom_id> 0 -1
+        DEL <context>:sample:<redbiom_id>
+        SREM <context>:samples-represented <redbiom_id>
+        SREM <context>:tag-members:<tag> <redbiom_id>
+        HGET <context>:feature-index-inverted <index>
+        LRANGE <context>:feature:<feature_id> 0 -1
+        DEL <context>:feature:<feature_id>
+        RPUSH <context>:feature:<feature_id> <index> <count> ...
+        SREM <context>:features-represented <feature_id>
+        SREM <context>:features-modified <feature_id>
+    INCR state:generation
 
     Returns
     -------
     int
         The number of samples deleted.
     """
+    import redbiom
     import redbiom._requests
 
-    delete = redbiom._requests.make_delete()
-    delete(context, 'DEL' ,study_id)
+    config = redbiom.get_config()
+    post = redbiom._requests.make_post(config)
+    se = redbiom._requests.make_script_exec(config)
+    sha = ScriptManager.get('delete-samples')
+
+    samples = list(samples)
+    if not samples:
+        return 0
+
+    _increment_generation(post)
+
+    n_deleted = 0
+    for start in range(0, len(samples), buffer_size):
+        block = samples[start:start + buffer_size]
+        n_deleted += int(se(sha, 0, context, *block))
+
+    _increment_generation(post)
+    return n_deleted
+
+
+def delete_sample_metadata(samples, buffer_size=250):
+    """Delete the metadata of samples
+
+    Parameters
+    ----------
+    samples : Iterable of str
+        The IDs of the samples, which may be tagged, to delete
+    buffer_size : int, optional
+        The number of samples to delete per request
+
+    Notes
+    -----
+    The metadata values of the samples are deleted and the category counts
+    updated. Categories left without samples are no longer represented. The
+    text search stems of each sample are derived from its stored values, as
+    they were on load, and the sample is removed from the sets of those
+    stems only. Values which could not be stored, as they contain a "/",
+    are not recovered.
+
+    Redis command summary
+    ---------------------
+    INCR state:generation
+    MGET metadata:categories:<sample_id> ... metadata:categories:<sample_id>
+    HMGET metadata:category:<column> <sample_id> ... <sample_id>
+    EVALSHA <delete-metadata-sha1> 0 <sample_id> ... <sample_id>
+        The script issues the following:
+        GET metadata:categories:<sample_id>
+        HDEL metadata:category:<column> <sample_id>
+        DEL metadata:categories:<sample_id>
+        SREM metadata:samples-represented <sample_id>
+        HLEN metadata:category:<column>
+        HSET metadata:category-counts <column> <count>
+        HDEL metadata:category-counts <column>
+        SREM metadata:categories-represented <column>
+    EVALSHA <remove-members-sha1> 0 <key> <nmembers> <member> ... ...
+        The script issues the following:
+        SREM metadata:text-search:<stem> <sample_id> ... <sample_id>
+        SREM metadata:category-search:<stem> <column> ... <column>
+    INCR state:generation
+
+    Returns
+    -------
+    int
+        The number of samples deleted.
+    """
+    import redbiom
+    import redbiom._requests
+    import redbiom.util
+    import pandas as pd
+
+    config = redbiom.get_config()
+    get = redbiom._requests.make_get(config, cache=False)
+    post = redbiom._requests.make_post(config)
+    se = redbiom._requests.make_script_exec(config)
+    sha = ScriptManager.get('delete-metadata')
+
+    samples = list(samples)
+    if not samples:
+        return 0
+
+    _increment_generation(post)
+
+    n_deleted = 0
+    emptied = []
+    for start in range(0, len(samples), buffer_size):
+        block = samples[start:start + buffer_size]
+
+        # the values are needed to determine the stems prior to deletion
+        stems = _metadata_stems(get, block)
+        deleted, columns = se(sha, 0, *block)
+        n_deleted += deleted
+        emptied.extend(columns)
+
+        _remove_members(se, {'metadata:text-search:%s' % stem: members
+                             for stem, members in stems.items()})
+
+    if emptied:
+        categories = [c.replace("_", " ") for c in emptied]
+        stems = redbiom.util.df_to_stems(pd.DataFrame(categories,
+                                                      index=emptied))
+        _remove_members(se, {'metadata:category-search:%s' % stem: cats
+                             for stem, cats in stems.items()})
+
+    _increment_generation(post)
+    return n_deleted
+
+
+def _metadata_stems(get, samples):
+    """Derive the text search stems of the stored metadata of samples
+
+    Parameters
+    ----------
+    get : make_get instance
+        A getter
+    samples : list of str
+        The samples, which may be tagged
+
+    Returns
+    -------
+    dict
+        {stem: {set of samples}}, see redbiom.util.df_to_stems
+    """
+    import json
+    import pandas as pd
+    import redbiom._requests
+    import redbiom.util
+
+    by_column = {}
+    getter = redbiom._requests.buffered(iter(samples), 'categories', 'MGET',
+                                        'metadata', get=get, buffer_size=100)
+    for block, column_sets in getter:
+        for sample, column_set in zip(block, column_sets):
+            if column_set is not None:
+                for column in json.loads(column_set):
+                    by_column.setdefault(column, []).append(sample)
+
+    index = []
+    values = []
+    for column, column_samples in by_column.items():
+        getter = redbiom._requests.buffered(iter(column_samples), None,
+                                            'HMGET', 'metadata', get=get,
+                                            buffer_size=100,
+                                            multikey='category:%s' % column)
+        for block, column_values in getter:
+            for sample, value in zip(block, column_values):
+                if value is not None:
+                    index.append(sample)
+                    values.append(value)
+
+    if not values:
+        return {}
+
+    # a row per stored value, as null values were not stored on load
+    return redbiom.util.df_to_stems(pd.DataFrame(values, index=index))
+
+
+def _remove_members(se, members, max_args=1000):
+    """Remove members from sets
+
+    Parameters
+    ----------
+    se : make_script_exec instance
+        A script executor
+    members : dict
+        {key: Iterable of members to remove from the set at key}
+    max_args : int, optional
+        The approximate number of arguments per request
+    """
+    sha = ScriptManager.get('remove-members')
+    batch = []
+    for key, key_members in sorted(members.items()):
+        key_members = list(key_members)
+        for start in range(0, len(key_members), max_args):
+            chunk = key_members[start:start + max_args]
+            if batch and len(batch) + len(chunk) + 2 > max_args:
+                se(sha, 0, *batch)
+                batch = []
+            batch.extend([key, str(len(chunk))])
+            batch.extend(chunk)
+    if batch:
+        se(sha, 0, *batch)
 
 
 def load_sample_data(table, context, tag=None, redis_protocol=False):
@@ -246,6 +1148,13 @@ def load_sample_data(table, context, tag=None, redis_protocol=False):
     consumption as sOTUs are large. The index is maintained in Redis under
     <context>:feature-index and <context>:feature-index-inverted.
 
+    The terminal feature indices beneath each taxon are indexed under
+    <context>:taxon-tips:<taxon>. The index is only maintained if it is
+    complete, that is, if the context did not hold taxonomy prior to the
+    introduction of the index. Taxonomy relationships which are already
+    represented in Redis are not written again, and the remainder are
+    written in bulk.
+
     The data are stored per sample with keys of the form "data:<sample_id>".
     The string stored is tab delimited, where the even indices (i.e .0, 2, 4,
     etc) correspond to the unique index value for an feature ID, and the
@@ -254,114 +1163,286 @@ def load_sample_data(table, context, tag=None, redis_protocol=False):
 
     Redis command summary
     ---------------------
-    EVALSHA <get-index-sha1> 1 <context>:feature-index <feature_id>
-    EVALSHA <get-index-sha1> 1 <context>:sample-index <redbiom_id>
+    HGETALL <context>:state
+    SCARD <context>:samples-represented
+    EVALSHA <get-indices-sha1> 1 <context>:feature-index <feature_id> ...
+    EVALSHA <get-indices-sha1> 1 <context>:sample-index <redbiom_id> ...
     LPUSH <context>:samples:<redbiom_id> <count> <feature_id> ...
     LPUSH <context>:features:<redbiom_id> <count> <redbiom_id> ...
     SADD <context>:samples-represented <redbiom_id> ... <redbiom_id>
+    SADD <context>:tag-members:<tag> <redbiom_id> ... <redbiom_id>
+    HSET <context>:state tag-members 1
     SADD <context>:features-represented <feature_id> ... <feature_id>
+    SADD <context>:features-modified <feature_id> ... <feature_id>
+    HSET <context>:state has-taxonomy 1
+    HINCRBY <context>:state taxonomy-version 1
+    HMGET <context>:taxonomy-parents <taxon> ... <taxon>
+    EVALSHA <bulk-write-sha1> 0 <context> <command> <key> <nargs> ...
+        The bulk write issues the following for each taxon not yet known:
+        SADD <context>:taxon-tips:<taxon> <feature_index> ... <feature_index>
+        SADD <context>:taxonomy-children:<taxon> <child> ... <child>
+        HMSET <context>:taxonomy-parents <child> <taxon> ... <child> <taxon>
+        SADD <context>:terminal-of:<taxon> <feature_index> ... <feature_index>
+    INCR state:generation
 
     Returns
     -------
     int
         The number of samples loaded.
     """
+    import numpy as np
     import redbiom
     import redbiom._requests
     import redbiom.util
 
     config = redbiom.get_config()
     post = redbiom._requests.make_post(config, redis_protocol=redis_protocol)
-    get = redbiom._requests.make_get(config)
+    bulk_post = redbiom._requests.make_bulk_post(config,
+                                                 redis_protocol=redis_protocol)
+    get = redbiom._requests.make_get(config, cache=False)
 
     redbiom._requests.valid(context, get)
 
-    table = _stage_for_load(table, context, get, tag)
+    # the commands of a mass insertion are not applied until piped into
+    # redis, so the load is resolved against a local copy of the state
+    if redis_protocol:
+        snapshot = _snapshot(context, get)
+        md_snapshot = _snapshot('metadata', get)
+    else:
+        snapshot = None
+        md_snapshot = None
+
+    table = _stage_for_load(table, context, get, tag, snapshot, md_snapshot)
     samples = table.ids()[:]
     obs = table.ids(axis='observation')
 
     if len(table.ids()) == 0:
         raise ValueError("The table is empty.")
 
-    obs_index = {}
-    for id_ in obs:
-        obs_index[id_] = get_index(context, id_, 'feature')
+    # the tag index is only valid if it covers all samples loaded
+    if redis_protocol:
+        state = snapshot['state']
+        unloaded = not snapshot['samples-represented']
+    else:
+        state = get(context, 'HGETALL', 'state')
+        unloaded = not get(context, 'SCARD', 'samples-represented')
+    index_tags = unloaded or 'tag-members' in state
 
-    samp_index = {}
-    for id_ in samples:
-        samp_index[id_] = get_index(context, id_, 'sample')
+    _increment_generation(post)
 
-    # load up per-sample
-    for values, id_, _ in table.iter(dense=False):
-        int_values = values.astype(int)
-        remapped = [obs_index[i] for i in obs[values.indices]]
+    if redis_protocol:
+        obs_index = _assign_indices(context, obs, 'feature', snapshot,
+                                    bulk_post)
+        samp_index = _assign_indices(context, samples, 'sample', snapshot,
+                                     bulk_post)
+    else:
+        obs_index = get_indices(context, obs, 'feature')
+        samp_index = get_indices(context, samples, 'sample')
+
+    matrix = table.matrix_data
 
-        packed = '/'.join(["%d/%s" % (v, i)
-                           for i, v in zip(remapped,
-                                           int_values.data)])
+    # load up per-sample
+    obs_lookup = np.array([obs_index[i] for i in obs], dtype=int)
+    for id_, packed in zip(samples, _pack_vectors(matrix.tocsc(),
+                                                  obs_lookup)):
         post(context, 'LPUSH', 'sample:%s/%s' % (id_, packed))
 
     payload = "samples-represented/%s" % '/'.join(samples)
     post(context, 'SADD', payload)
+    if redis_protocol:
+        snapshot['samples-represented'].update(samples)
 
-    # load up per-observation
-    for values, id_, md in table.iter(axis='observation', dense=False):
-        int_values = values.astype(int)
-        remapped = [samp_index[i] for i in samples[values.indices]]
+    payload = "tag-members:%s/%s" % ('UNTAGGED' if tag is None else tag,
+                                     '/'.join(samples))
+    post(context, 'SADD', payload)
+    if index_tags and 'tag-members' not in state:
+        post(context, 'HSET', "state/tag-members/1")
+        state['tag-members'] = '1'
 
-        packed = '/'.join(["%d/%s" % (v, i)
-                           for i, v in zip(remapped,
-                                           int_values.data)])
+    # load up per-observation
+    samp_lookup = np.array([samp_index[i] for i in samples], dtype=int)
+    for id_, packed in zip(obs, _pack_vectors(matrix.tocsr(),
+                                              samp_lookup)):
         post(context, 'LPUSH', 'feature:%s/%s' % (id_, packed))
 
     payload = "features-represented/%s" % '/'.join(obs)
     post(context, 'SADD', payload)
 
+    # the lists of these features are revisited by compact_features
+    payload = "features-modified/%s" % '/'.join(obs)
+    post(context, 'SADD', payload)
+
     # load up taxonomy
     taxonomy = _metadata_to_taxonomy_tree(table.ids(axis='observation'),
                                           table.metadata(axis='observation'))
     if taxonomy is not None:
-        post(context, 'HSET', "state/has-taxonomy/1")
-        hmgetter = redbiom._requests.buffered
+        # the tip index is only valid if it covers all taxonomy loaded
+        index_tips = 'has-taxonomy' not in state or 'taxon-tips' in state
 
-        tip_names = {n.name: n for n in taxonomy.tips()}
-        ids_ = hmgetter(tip_names, None, 'HMGET', context,
-                        get=get, buffer_size=100,
-                        multikey='feature-index')
+        post(context, 'HSET', "state/has-taxonomy/1")
+        post(context, 'HINCRBY', "state/taxonomy-version/1")
+        if index_tips:
+            post(context, 'HSET', "state/taxon-tips/1")
+
+        if redis_protocol:
+            state['has-taxonomy'] = '1'
+            if index_tips:
+                state['taxon-tips'] = '1'
+
+        # the tips are the features of the table, which are already indexed
+        for tip in taxonomy.tips():
+            tip.name = str(obs_index[tip.name])
+
+        # relationships already held need not be written again
+        nodes = [n.name for n in taxonomy.postorder(include_self=False)]
+        if redis_protocol:
+            parents = snapshot['taxonomy-parents']
+        else:
+            parents = {}
+            hmgetter = redbiom._requests.buffered
+            for blk in hmgetter(nodes, None, 'HMGET', context, get=get,
+                                buffer_size=100,
+                                multikey='taxonomy-parents'):
+                for entity, parent in zip(*blk):
+                    parents[entity] = parent
+
+        commands = []
+        tips_beneath = {}
+        subtree_known = {}
+        for node in taxonomy.postorder(include_self=False):
+            if node.is_tip():
+                continue
 
-        for blk in ids_:
-            for entity, idx in zip(*blk):
-                tip_names[entity].name = idx
+            # define node -> children relationships
+            pack = []
+            terminal_pack = []
+            tips = []
+            known = True
+            known_beneath = True
+            for c in node.children:
+                known &= parents.get(c.name) == node.name
+                if c.is_tip():
+                    pack.append('has-terminal')
+                    terminal_pack.append(c.name)
+                    tips.append(c.name)
+                else:
+                    pack.append(c.name)
+                    tips.extend(tips_beneath.pop(id(c)))
+                    known_beneath &= subtree_known.pop(id(c))
+            tips_beneath[id(node)] = tips
+            subtree_known[id(node)] = known and known_beneath
+
+            # define node -> all tips beneath relationships. These precede
+            # the edges of the node, which are what a later load uses to skip
+            # them, so an interrupted load cannot leave the tips unwritten.
+            if index_tips and not subtree_known[id(node)]:
+                commands.append(('SADD', 'taxon-tips:%s' % node.name, tips))
+
+            if not known:
+                commands.append(('SADD', 'taxonomy-children:%s' % node.name,
+                                 pack))
 
-        for node in taxonomy.postorder(include_self=False):
-            if not node.is_tip():
-                # define node -> children relationships
+                # define children -> parent relationships
                 pack = []
-                terminal_pack = []
                 for c in node.children:
-                    if c.is_tip():
-                        pack.append('has-terminal')
-                        terminal_pack.append(c.name)
-                    else:
-                        pack.append(c.name)
+                    pack.extend([c.name, node.name])
+                commands.append(('HMSET', 'taxonomy-parents', pack))
 
-                packed = '/'.join(pack)
-                post(context, 'SADD', 'taxonomy-children:%s/%s' % (node.name,
-                                                                   packed))
-
-                # define children -> parent relationships
-                pack = ['%s/%s' % (c.name, node.name)
-                        for c in node.children]
-                post(context, 'HMSET', 'taxonomy-parents/%s' % '/'.join(pack))
+                if redis_protocol:
+                    for c in node.children:
+                        parents[c.name] = node.name
 
                 if terminal_pack:
-                    id_pack = '/'.join(terminal_pack)
-                    post(context, 'SADD', 'terminal-of:%s/%s' % (node.name,
-                                                                 id_pack))
+                    commands.append(('SADD', 'terminal-of:%s' % node.name,
+                                     terminal_pack))
+
+        bulk_post(context, commands)
+
+    redbiom._requests.reset_state()
+    _increment_generation(post)
+
+    if redis_protocol:
+        redbiom._requests.flush_resp()
 
     return len(samples)
 
 
+def compact_features(context, full=False, buffer_size=100):
+    """Rewrite the feature lists of a context compactly
+
+    Parameters
+    ----------
+    context : str
+        The context to compact.
+    full : bool, optional
+        If True, compact all features represented in the context. By
+        default, only the features whose lists have been pushed to since
+        they were last compacted are operated on.
+    buffer_size : int, optional
+        The number of features to compact per request.
+
+    Notes
+    -----
+    Each load pushes to the list of every feature it observes, so the lists
+    of common features grow with each load. A compacted list holds a single
+    index/count pair per sample, in order of sample index, and omits samples
+    which are no longer represented. A feature left without samples is
+    removed from the features represented.
+
+    The features are visited by SSCAN, and each block of features is
+    compacted atomically, so the memory used is bounded by the block and the
+    job can be interrupted and run again.
+
+    Redis command summary
+    ---------------------
+    INCR state:generation
+    SSCAN <context>:features-modified <cursor> COUNT <buffer_size>
+    EVALSHA <compact-features-sha1> 0 <context> <feature_id> ...
+        The script issues the following for each feature:
+        LRANGE <context>:feature:<feature_id> 0 -1
+        HGET <context>:sample-index-inverted <index>
+        SISMEMBER <context>:samples-represented <redbiom_id>
+        DEL <context>:feature:<feature_id>
+        RPUSH <context>:feature:<feature_id> <index> <count> ...
+        SREM <context>:features-modified <feature_id>
+    INCR state:generation
+
+    Returns
+    -------
+    tuple of int
+        The number of features compacted, and the number of index/count
+        pairs removed.
+    """
+    import redbiom
+    import redbiom._requests
+
+    config = redbiom.get_config()
+    get = redbiom._requests.make_get(config, cache=False)
+    post = redbiom._requests.make_post(config)
+    se = redbiom._requests.make_script_exec(config)
+
+    redbiom._requests.valid(context, get)
+    sha = ScriptManager.get('compact-features')
+    key = 'features-represented' if full else 'features-modified'
+
+    _increment_generation(post)
+
+    n_features = 0
+    n_removed = 0
+    cursor = '0'
+    while True:
+        cursor, block = get(context, 'SSCAN', '%s/%s/COUNT/%d' %
+                            (key, cursor, buffer_size))
+        if block:
+            n_removed += int(se(sha, 0, context, *block))
+            n_features += len(block)
+        if cursor == '0':
+            break
+
+    _increment_generation(post)
+    return n_features, n_removed
+
+
 def _metadata_to_taxonomy_tree(ids, metadata):
     """Cast the taxonomy into a tree
 
@@ -403,7 +1484,7 @@ def _metadata_to_taxonomy_tree(ids, metadata):
     return t
 
 
-def load_sample_metadata(md, tag=None):
+def load_sample_metadata(md, tag=None, redis_protocol=False):
     """Load sample metadata.
 
     Parameters
@@ -413,6 +1494,8 @@ def load_sample_metadata(md, tag=None):
     tag : str, optional
         A tag associated with the information being loaded such as a
         preparation ID.
+    redis_protocol : bool, optional
+        Generate commands for bulk load instead of HTTP requests.
 
     Notes
     -----
@@ -429,9 +1512,14 @@ def load_sample_metadata(md, tag=None):
     ---------------------
     SMEMBERS metadata:samples-represented
     SET metadata:categories:<sample_id> <JSON-of-informative-columns>
+    HMGET metadata:category-counts <column> ... <column>
+    HLEN metadata:category:<column>
+    HSETNX metadata:category-counts <column> <count>
     HMSET metadata:category:<column> <sample_id> <val> ... <sample_id> <val>
+    HINCRBY metadata:category-counts <column> <count>
     SADD metadata:samples-represented <sample_id> ... <sample_id> ...
     SADD metadata:categories-represented <column> ... <column>
+    INCR state:generation
     """
     import json
     import redbiom
@@ -439,9 +1527,12 @@ def load_sample_metadata(md, tag=None):
     import redbiom.util
 
     config = redbiom.get_config()
-    post = redbiom._requests.make_post(config)
-    put = redbiom._requests.make_put(config)
-    get = redbiom._requests.make_get(config)
+    post = redbiom._requests.make_post(config, redis_protocol=redis_protocol)
+    put = redbiom._requests.make_put(config, redis_protocol=redis_protocol)
+    get = redbiom._requests.make_get(config, cache=False)
+
+    # see load_sample_data
+    snapshot = _snapshot('metadata', get) if redis_protocol else None
 
     null_values = redbiom.util.NULL_VALUES
 
@@ -454,7 +1545,10 @@ def load_sample_metadata(md, tag=None):
 
         # if the metadata are tagged, they must have sample metadata already
         # loaded
-        if not redbiom.util.has_sample_metadata(original_ids):
+        md_represented = None if snapshot is None else \
+            snapshot['samples-represented']
+        if not redbiom.util.has_sample_metadata(original_ids,
+                                                represented=md_represented):
             raise ValueError("Sample metadata must be loaded first.")
 
         # tag the sample IDs
@@ -463,11 +1557,16 @@ def load_sample_metadata(md, tag=None):
     md.set_index(md.columns[0], inplace=True)
 
     # subset to only the novel IDs
-    represented = get('metadata', 'SMEMBERS', 'samples-represented')
-    md = md.loc[set(md.index) - set(represented)]
+    if snapshot is None:
+        represented = set(get('metadata', 'SMEMBERS', 'samples-represented'))
+    else:
+        represented = snapshot['samples-represented']
+    md = md.loc[[i for i in md.index if i not in represented]]
     if len(md) == 0:
         return 0
 
+    _increment_generation(post)
+
     samples = md.index
     indexed_columns = md.columns
     for idx, row in md.iterrows():
@@ -479,6 +1578,28 @@ def load_sample_metadata(md, tag=None):
         # TODO: express metadata-categories using redis sets, see #18
         put('metadata', 'SET', key, json.dumps(columns))
 
+    # the counts of categories loaded before the counts were tracked are
+    # seeded from HLEN, once, prior to being incremented
+    seeds = {}
+    if snapshot is None:
+        getter = redbiom._requests.buffered(iter(indexed_columns), None,
+                                            'HMGET', 'metadata', get=get,
+                                            buffer_size=100,
+                                            multikey='category-counts')
+        for columns, counts in getter:
+            for col, count in zip(columns, counts):
+                if count is None:
+                    seeds[col] = get('metadata', 'HLEN', 'category:%s' % col)
+    else:
+        # HSETNX leaves a count which is already stored as is
+        seeds = {col: snapshot['category-counts'].get(col, 0)
+                 for col in indexed_columns}
+
+    for col in indexed_columns:
+        if seeds.get(col):
+            post('metadata', 'HSETNX',
+                 'category-counts/%s/%d' % (col, seeds[col]))
+
     for col in indexed_columns:
         bulk_set = ["%s/%s" % (idx, v) for idx, v in zip(md.index, md[col])
                     if _indexable(v, null_values)]
@@ -486,16 +1607,32 @@ def load_sample_metadata(md, tag=None):
         payload = "category:%s/%s" % (col, '/'.join(bulk_set))
         post('metadata', 'HMSET', payload)
 
+        # only novel samples are loaded so each value is a new field. the
+        # count is incremented rather than set so concurrent loads are not
+        # lost
+        if bulk_set:
+            post('metadata', 'HINCRBY',
+                 'category-counts/%s/%d' % (col, len(bulk_set)))
+            if snapshot is not None:
+                counts = snapshot['category-counts']
+                counts[col] = counts.get(col, 0) + len(bulk_set)
+
     payload = "samples-represented/%s" % '/'.join(md.index)
     post('metadata', 'SADD', payload)
 
     payload = "categories-represented/%s" % '/'.join(md.columns)
     post('metadata', 'SADD', payload)
 
+    _increment_generation(post)
+
+    if redis_protocol:
+        snapshot['samples-represented'].update(md.index)
+        redbiom._requests.flush_resp()
+
     return len(samples)
 
 
-def load_sample_metadata_full_search(md, tag=None):
+def load_sample_metadata_full_search(md, tag=None, redis_protocol=False):
     """Load stem -> sample associations
 
     Parameters
@@ -505,6 +1642,8 @@ def load_sample_metadata_full_search(md, tag=None):
     tag : str, optional
         A tag associated with the information being loaded such as a
         preparation ID.
+    redis_protocol : bool, optional
+        Generate commands for bulk load instead of HTTP requests.
 
     Notes
     -----
@@ -521,6 +1660,7 @@ def load_sample_metadata_full_search(md, tag=None):
     ---------------------
     SADD metadata:text-search:<stem> <sample-id> ... <sample-id>
     SADD metadata:category-search:<stem> <category> ... <category>
+    INCR state:generation
     """
     import redbiom
     import redbiom._requests
@@ -528,7 +1668,13 @@ def load_sample_metadata_full_search(md, tag=None):
     import pandas as pd
 
     config = redbiom.get_config()
-    post = redbiom._requests.make_post(config)
+    post = redbiom._requests.make_post(config, redis_protocol=redis_protocol)
+
+    # see load_sample_data
+    md_represented = None
+    if redis_protocol:
+        get = redbiom._requests.make_get(config, cache=False)
+        md_represented = _snapshot('metadata', get)['samples-represented']
 
     md = md.copy()
     if md.columns[0] not in ['#SampleID', 'sample_name']:
@@ -540,9 +1686,12 @@ def load_sample_metadata_full_search(md, tag=None):
 
     md.set_index(md.columns[0], inplace=True)
 
-    if not redbiom.util.has_sample_metadata(set(md.index)):
+    if not redbiom.util.has_sample_metadata(set(md.index),
+                                            represented=md_represented):
         raise ValueError("Sample metadata must be loaded first.")
 
+    _increment_generation(post)
+
     # metadata value stems -> samples
     stems = redbiom.util.df_to_stems(md)
     for stem, samples in stems.items():
@@ -559,6 +1708,11 @@ def load_sample_metadata_full_search(md, tag=None):
         post('metadata', 'SADD', payload)
     cat_stems = len(stems)
 
+    _increment_generation(post)
+
+    if redis_protocol:
+        redbiom._requests.flush_resp()
+
     return (value_stems, cat_stems)
 
 
@@ -577,7 +1731,68 @@ def _indexable(value, nullables):
         return '/' not in value
 
 
-def _stage_for_load(table, context, get, tag=None):
+def _pack_vectors(matrix, lookup):
+    """Form the LPUSH payloads of each vector of a compressed sparse matrix
+
+    Parameters
+    ----------
+    matrix : scipy.sparse.csc_matrix or scipy.sparse.csr_matrix
+        The matrix to pack. A payload is formed for each column of a CSC
+        matrix, or each row of a CSR matrix.
+    lookup : np.array of int
+        The redis index of each position along the other axis.
+
+    Notes
+    -----
+    The payload of a vector is of the form "<count>/<index>/<count>/...".
+    The counts and indices are interleaved and their decimal digits written
+    into a single buffer covering the whole matrix, one pass per digit, and
+    each payload is then sliced out of it. Counts are truncated to int, and
+    are assumed to be nonnegative.
+
+    Returns
+    -------
+    list of str
+        The payloads in the order of the vectors of the matrix.
+    """
+    import numpy as np
+
+    if matrix.nnz == 0:
+        return ['' for _ in range(len(matrix.indptr) - 1)]
+
+    values = np.empty(2 * matrix.nnz, dtype=np.int64)
+    values[0::2] = matrix.data
+    values[1::2] = lookup[matrix.indices]
+
+    ndigits = np.ones(len(values), dtype=np.int64)
+    largest = values.max()
+    power = 10
+    while power <= largest:
+        ndigits += values >= power
+        power *= 10
+
+    # each value is followed by a "/", and digits are written from the last
+    separators = np.cumsum(ndigits + 1) - 1
+    buf = np.empty(separators[-1] + 1, dtype=np.uint8)
+    buf[separators] = ord('/')
+    for place in range(ndigits.max()):
+        present = ndigits > place
+        buf[separators[present] - 1 - place] = \
+            ord('0') + values[present] % 10
+        values //= 10
+    packed = buf.tobytes().decode('ascii')
+
+    # the start of each count/index pair
+    offsets = np.zeros(matrix.nnz + 1, dtype=np.int64)
+    offsets[1:] = separators[1::2] + 1
+
+    indptr = matrix.indptr
+    return [packed[offsets[start]:offsets[end] - 1] if end > start else ''
+            for start, end in zip(indptr[:-1], indptr[1:])]
+
+
+def _stage_for_load(table, context, get, tag=None, snapshot=None,
+                    md_snapshot=None):
     """Tag samples, reduce to only those relevant to load
 
     Parameters
@@ -590,6 +1805,10 @@ def _stage_for_load(table, context, get, tag=None):
         A getter
     tag : str, optional
         The tag to apply to the samples
+    snapshot : dict, optional
+        The local state of the context, see _snapshot.
+    md_snapshot : dict, optional
+        The local state of the metadata, see _snapshot.
 
     Raises
     ------
@@ -611,11 +1830,16 @@ def _stage_for_load(table, context, get, tag=None):
                              inplace=False)
     samples = set(table.ids())
 
-    represented = get(context, 'SMEMBERS', 'samples-represented')
-    represented = set(represented)
+    if snapshot is None:
+        represented = set(get(context, 'SMEMBERS', 'samples-represented'))
+    else:
+        represented = snapshot['samples-represented']
     to_load = samples - represented
 
-    if not redbiom.util.has_sample_metadata(to_load):
+    md_represented = None if md_snapshot is None else \
+        md_snapshot['samples-represented']
+    if not redbiom.util.has_sample_metadata(to_load,
+                                            represented=md_represented):
         raise ValueError("Sample metadata must be loaded first.")
 
     table.filter(to_load)
@@ -666,3 +1890,549 @@ def get_index(context, key, axis):
                                                              req.content))
 
     return int(req.json()['EVALSHA'])
+
+
+def get_indices(context, keys, axis, buffer_size=100):
+    """Get unique integer values for many keys within a context
+
+    Parameters
+    ----------
+    context : str
+        The context to operate in
+    keys : Iterable of str
+        The keys to get unique indices for
+    axis : str
+        Either feature or sample
+    buffer_size : int, optional
+        The number of keys to obtain indices for per request
+
+    Notes
+    -----
+    The keys are indexed in order, a block at a time, and each block is
+    atomic. The result is the same as calling get_index with each key.
+
+    Redis command summary
+    ---------------------
+    EVALSHA <get-indices-sha1> 1 <context>:<axis>-index <key> ... <key>
+
+    Returns
+    -------
+    dict
+        {key: index}
+    """
+    import redbiom
+    import redbiom._requests
+
+    config = redbiom.get_config()
+    se = redbiom._requests.make_script_exec(config)
+    sha = ScriptManager.get('get-indices')
+    index_key = "%s:%s-index" % (context, axis)
+
+    keys = list(keys)
+    indices = {}
+    for start in range(0, len(keys), buffer_size):
+        block = keys[start:start + buffer_size]
+        indices.update(zip(block, se(sha, 1, index_key, *block)))
+    return indices
+
+
+# local copies of the state mass insertions depend on, see _snapshot
+_snapshots = {}
+
+
+def _snapshot(context, get):
+    """Obtain a local copy of the state a mass insertion depends on
+
+    Parameters
+    ----------
+    context : str
+        The context to obtain the state of, or "metadata".
+    get : make_get instance
+        A getter
+
+    Notes
+    -----
+    The commands of a mass insertion are not applied until they are piped
+    into Redis, so the state a load depends on is obtained once per process
+    and updated locally as commands are produced. It is assumed that there
+    are no other writers while the commands are pending.
+
+    Returns
+    -------
+    dict
+        The samples represented, and for a context, the feature and sample
+        indices, the next index of each, the context state and the taxonomy
+        parents. For the metadata, the number of samples per category.
+
+    Redis command summary
+    ---------------------
+    SMEMBERS <context>:samples-represented
+    HGETALL <context>:feature-index
+    HGETALL <context>:sample-index
+    HGETALL <context>:state
+    HGETALL <context>:taxonomy-parents
+    HGETALL metadata:category-counts
+    SMEMBERS metadata:categories-represented
+    HLEN metadata:category:<column>
+    """
+    if context in _snapshots:
+        return _snapshots[context]
+
+    represented = get(context, 'SMEMBERS', 'samples-represented')
+    snapshot = {'samples-represented': set(represented)}
+
+    if context == 'metadata':
+        # categories loaded before the counts were tracked fall back to HLEN
+        counts = get(context, 'HGETALL', 'category-counts')
+        for col in get(context, 'SMEMBERS', 'categories-represented'):
+            if col not in counts:
+                counts[col] = get(context, 'HLEN', 'category:%s' % col)
+        snapshot['category-counts'] = {col: int(count)
+                                       for col, count in counts.items()}
+    else:
+        for axis in ('feature', 'sample'):
+            index = get(context, 'HGETALL', '%s-index' % axis)
+            current = int(index.pop('current_id', 0))
+            snapshot['%s-index' % axis] = {id_: int(idx)
+                                           for id_, idx in index.items()}
+            snapshot['%s-current' % axis] = current
+        snapshot['state'] = get(context, 'HGETALL', 'state')
+        snapshot['taxonomy-parents'] = get(context, 'HGETALL',
+                                           'taxonomy-parents')
+
+    _snapshots[context] = snapshot
+    return snapshot
+
+
+def _assign_indices(context, ids, axis, snapshot, bulk_post):
+    """Assign indices locally, as the get-index script does, for mass insertion
+
+    Parameters
+    ----------
+    context : str
+        The context to assign indices in.
+    ids : Iterable of str
+        The IDs to obtain indices for.
+    axis : {'feature', 'sample'}
+        The axis of the IDs.
+    snapshot : dict
+        The local state of the context, see _snapshot.
+    bulk_post : make_bulk_post instance
+        A bulk poster
+
+    Returns
+    -------
+    dict
+        {id: index}
+
+    Redis command summary
+    ---------------------
+    HMSET <context>:<axis>-index <id> <index> ... current_id <next-index>
+    HMSET <context>:<axis>-index-inverted <index> <id> ... <index> <id>
+    """
+    index = snapshot['%s-index' % axis]
+    current = snapshot['%s-current' % axis]
+
+    forward = []
+    inverted = []
+    for id_ in ids:
+        if id_ not in index:
+            index[id_] = current
+            forward.extend([id_, current])
+            inverted.extend([current, id_])
+            current += 1
+
+    if forward:
+        forward.extend(['current_id', current])
+        bulk_post(context, [('HMSET', '%s-index' % axis, forward),
+                            ('HMSET', '%s-index-inverted' % axis, inverted)])
+        snapshot['%s-current' % axis] = current
+
+    return {id_: index[id_] for id_ in ids}
+
+
+# state shared with the worker processes of build_dump
+_dump_worker_state = {}
+
+
+def _init_dump_worker(represented, contexts):
+    """Share the state of the dump with a worker process"""
+    _snapshots['metadata'] = {'samples-represented': represented,
+                              'category-counts': {}}
+    _dump_worker_state['contexts'] = contexts
+
+
+def _read_metadata(path):
+    """Read a QIIME or Qiita compatible metadata file"""
+    import pandas as pd
+    return pd.read_csv(path, sep='\t', dtype=str, keep_default_na=False,
+                       na_values=[])
+
+
+def _dump_commands(func, *args):
+    """Capture the commands in the native protocol produced by func"""
+    import io
+    import redbiom._requests
+
+    buf = io.BytesIO()
+    previous = redbiom._requests.set_resp_output(buf)
+    try:
+        func(*args)
+        redbiom._requests.flush_resp()
+    finally:
+        redbiom._requests.set_resp_output(previous)
+    return buf.getvalue()
+
+
+def _table_ids(task):
+    """Obtain the tagged sample IDs and the observed features of a table"""
+    import biom
+
+    _, tag, path = task
+    if tag is None:
+        tag = 'UNTAGGED'
+
+    table = biom.load_table(path)
+    table.filter(lambda v, i, md: v.sum() > 0, axis='observation')
+    return (['%s_%s' % (tag, i) for i in table.ids()],
+            list(table.ids(axis='observation')))
+
+
+def _dump_search(path):
+    """Produce the text search commands for a metadata file"""
+    md = _read_metadata(path)
+    return _dump_commands(load_sample_metadata_full_search, md, None, True)
+
+
+def _dump_table(task):
+    """Produce the commands for a table whose indices are assigned"""
+    import biom
+    import redbiom._requests
+
+    context, tag, path, feature_index, sample_index, claimed = task
+
+    # the load is resolved entirely against local state
+    redbiom._requests._state.update({
+        'contexts': _dump_worker_state['contexts'],
+        'scripts': {},
+        'context-state': {}})
+    _snapshots[context] = {'samples-represented': set(claimed),
+                           'feature-index': feature_index,
+                           'feature-current': len(feature_index),
+                           'sample-index': sample_index,
+                           'sample-current': len(sample_index),
+                           'state': {'tag-members': '1'},
+                           'taxonomy-parents': {}}
+
+    table = biom.load_table(path)
+    return _dump_commands(load_sample_data, table, context, tag, True)
+
+
+def build_dump(directory, output, jobs=1):
+    """Produce the commands to load an export into a fresh database
+
+    Parameters
+    ----------
+    directory : str
+        The export. Sample metadata are QIIME or Qiita compatible files
+        under <directory>/metadata. BIOM tables are loaded from
+        <directory>/<context>/<tag>.biom, and a context is described by the
+        optional file <directory>/<context>/description.txt.
+    output : file-like
+        A binary file to write the commands in the native protocol to.
+    jobs : int, optional
+        The number of worker processes to use.
+
+    Notes
+    -----
+    No requests are made of Redis. The commands assume a fresh database, and
+    are intended for use with redis-cli --pipe, for instance to populate a
+    new database which then replaces the current one.
+
+    Sample metadata and indices are assigned in a single process in a
+    stable order, such that the result does not depend on the number of
+    jobs. The text search and the data of each table, which do not depend on
+    other state, are produced by the workers. A table is omitted if any of
+    its samples lack metadata. The read-only scripts are loaded.
+
+    Returns
+    -------
+    dict
+        The number of metadata samples and tables loaded, and the paths of
+        the tables omitted.
+    """
+    import os
+    import hashlib
+    import redbiom
+    import redbiom._requests
+    import redbiom.util
+
+    config = redbiom.get_config()
+    bulk_post = redbiom._requests.make_bulk_post(config, redis_protocol=True)
+    write_resp = redbiom._requests.write_resp
+
+    md_dir = os.path.join(directory, 'metadata')
+    md_paths = []
+    if os.path.isdir(md_dir):
+        md_paths = [os.path.join(md_dir, name)
+                    for name in sorted(os.listdir(md_dir))]
+
+    contexts = {}
+    tables = []
+    for context in sorted(os.listdir(directory)):
+        path = os.path.join(directory, context)
+        if context == 'metadata' or not os.path.isdir(path):
+            continue
+
+        description = ''
+        description_path = os.path.join(path, 'description.txt')
+        if os.path.exists(description_path):
+            with open(description_path) as fp:
+                description = fp.read().strip()
+        contexts[context] = description
+
+        for name in sorted(os.listdir(path)):
+            tag, ext = os.path.splitext(name)
+            if ext == '.biom':
+                tables.append((context, tag, os.path.join(path, name)))
+
+    previous = redbiom._requests.set_resp_output(output)
+    pool = None
+    try:
+        for name, script in sorted(ScriptManager._scripts.items()):
+            if name in ScriptManager._admin_scripts:
+                continue
+            sha1 = hashlib.sha1(script.encode('ascii')).hexdigest()
+            write_resp(['SCRIPT', 'LOAD', script])
+            write_resp(['HSET', 'state:scripts', name, sha1])
+
+        for context, description in sorted(contexts.items()):
+            write_resp(['HSET', 'state:contexts', context, description])
+            write_resp(['HSET', '%s:state' % context, 'db-version',
+                        redbiom.__db_version__])
+            write_resp(['HSET', '%s:state' % context, 'tag-members', '1'])
+
+        # a fresh database holds nothing
+        _snapshots.clear()
+        _snapshots['metadata'] = {'samples-represented': set(),
+                                  'category-counts': {}}
+        n_samples = 0
+        for path in md_paths:
+            n_samples += load_sample_metadata(_read_metadata(path),
+                                              redis_protocol=True)
+        md_snapshot = _snapshots['metadata']
+        represented = md_snapshot['samples-represented']
+
+        if jobs > 1:
+            import multiprocessing
+            pool = multiprocessing.Pool(jobs, initializer=_init_dump_worker,
+                                        initargs=(represented, contexts))
+            imap = pool.imap
+        else:
+            _init_dump_worker(represented, contexts)
+            imap = map
+
+        for commands in imap(_dump_search, md_paths):
+            redbiom._requests.flush_resp()
+            output.write(commands)
+
+        # indices are assigned in order of the contexts and tables
+        loaded = []
+        skipped = []
+        for task, (samples, obs) in zip(tables, imap(_table_ids, tables)):
+            context, tag, path = task
+            snapshot = _snapshots.setdefault(context, {
+                'samples-represented': set(),
+                'feature-index': {}, 'feature-current': 0,
+                'sample-index': {}, 'sample-current': 0,
+                'state': {}, 'taxonomy-parents': {}})
+
+            claimed = snapshot['samples-represented'].intersection(samples)
+            to_load = [s for s in samples if s not in claimed]
+            if not to_load or not redbiom.util.has_sample_metadata(
+                    to_load, represented=represented):
+                skipped.append(path)
+                continue
+
+            if claimed:
+                # the observed features depend on the samples to load
+                import biom
+                staged = _stage_for_load(biom.load_table(path), context,
+                                         None, tag, snapshot, md_snapshot)
+                obs = staged.ids(axis='observation')
+
+            feature_index = _assign_indices(context, obs, 'feature',
+                                            snapshot, bulk_post)
+            sample_index = _assign_indices(context, to_load, 'sample',
+                                           snapshot, bulk_post)
+            snapshot['samples-represented'].update(to_load)
+            loaded.append((context, tag, path, feature_index, sample_index,
+                           claimed))
+
+        for commands in imap(_dump_table, loaded):
+            redbiom._requests.flush_resp()
+            output.write(commands)
+
+        write_resp(['INCR', 'state:generation'])
+        redbiom._requests.flush_resp()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        redbiom._requests.set_resp_output(previous)
+        _snapshots.clear()
+
+    return {'samples': n_samples, 'tables': len(loaded), 'skipped': skipped}
+
+
+def _describe_error(error):
+    """Summarize an exception for reporting from a worker"""
+    return "%s: %s" % (type(error).__name__, error)
+
+
+def _parallel_ids(task):
+    """Obtain the IDs of a table, isolating any failure to the table"""
+    try:
+        return _table_ids(task), None
+    except Exception as e:
+        return None, _describe_error(e)
+
+
+def _parallel_load(task):
+    """Load a table, isolating any failure to the table"""
+    import biom
+
+    context, tag, path = task
+    try:
+        table = biom.load_table(path)
+        return task, load_sample_data(table, context, tag), None
+    except Exception as e:
+        return task, 0, _describe_error(e)
+
+
+def load_sample_data_parallel(tables, jobs=1):
+    """Load many tables of sample data over worker processes
+
+    Parameters
+    ----------
+    tables : Iterable of (str, str, str)
+        The context, tag and BIOM table path of each load. The tag may be
+        None.
+    jobs : int, optional
+        The number of worker processes to use.
+
+    Notes
+    -----
+    The tables are first read to obtain their IDs. The feature and sample
+    indices of each context are then assigned for the union of the tables
+    in a single batched step, ordered by the tables, so the loads themselves
+    do not contend on the indices. Indices for a table which is partially
+    represented already are assigned by its load, as its features depend on
+    the samples loaded; get-indices is atomic, so this is safe concurrently.
+
+    A table sharing samples with a prior table of the same context is
+    deferred until that table has loaded, such that a sample is not loaded
+    twice. A failure to read or load a table does not affect the others.
+
+    Redis command summary
+    ---------------------
+    SMEMBERS <context>:samples-represented
+    EVALSHA <get-indices-sha1> 1 <context>:feature-index <feature_id> ...
+    EVALSHA <get-indices-sha1> 1 <context>:sample-index <redbiom_id> ...
+    See load_sample_data for the commands of each load.
+
+    Returns
+    -------
+    generator of ((str, str, str), int, str or None)
+        Each table as it is completed, the number of samples loaded from it,
+        and a description of the error if the table failed to load.
+    """
+    import redbiom
+    import redbiom._requests
+    import redbiom.util
+
+    config = redbiom.get_config()
+    get = redbiom._requests.make_get(config, cache=False)
+
+    tables = list(tables)
+
+    pool = None
+    if jobs > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs)
+        imap = pool.imap
+        imap_unordered = pool.imap_unordered
+    else:
+        imap = map
+        imap_unordered = map
+
+    try:
+        represented = {}
+        rounds = []
+        claims = []
+        features = {}
+        samples = {}
+        for task, (ids, error) in zip(tables, imap(_parallel_ids, tables)):
+            if error is not None:
+                yield task, 0, error
+                continue
+
+            context = task[0]
+            if context not in represented:
+                try:
+                    redbiom._requests.valid(context, get)
+                except ValueError as e:
+                    represented[context] = e
+                else:
+                    represented[context] = set(get(context, 'SMEMBERS',
+                                                   'samples-represented'))
+            if isinstance(represented[context], Exception):
+                yield task, 0, _describe_error(represented[context])
+                continue
+
+            table_samples, table_features = ids
+            novel = [s for s in table_samples
+                     if s not in represented[context]]
+            if novel and not redbiom.util.has_sample_metadata(novel):
+                error = ValueError("Sample metadata must be loaded first.")
+                yield task, 0, _describe_error(error)
+                continue
+
+            # the table follows the last round holding any of its samples
+            order = 0
+            for i, claimed in enumerate(claims):
+                if not claimed.get(context, set()).isdisjoint(novel):
+                    order = i + 1
+            if order == len(rounds):
+                rounds.append([])
+                claims.append({})
+            rounds[order].append(task)
+            claims[order].setdefault(context, set()).update(novel)
+
+            if order == 0 and len(novel) == len(table_samples):
+                features.setdefault(context, []).extend(table_features)
+                samples.setdefault(context, []).extend(novel)
+
+        for context, ids in features.items():
+            get_indices(context, _unique(ids), 'feature')
+        for context, ids in samples.items():
+            get_indices(context, ids, 'sample')
+
+        for tasks in rounds:
+            for result in imap_unordered(_parallel_load, tasks):
+                yield result
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def _unique(items):
+    """The unique items in order of first occurrence"""
+    seen = set()
+    unique = []
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            unique.append(item)
+    return unique
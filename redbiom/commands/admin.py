@@ -57,31 +57,138 @@ def load_sample_data(table, context, tag, mass_insertion):
                                    redis_protocol=mass_insertion)
 
 
+@admin.command(name='load-sample-data-parallel')
+@click.option('--tables', required=True, type=click.File('r'),
+              help=("The tables to load, one per line, as tab delimited "
+                    "context, tag and filepath. The tag may be empty."))
+@click.option('--jobs', required=False, type=int, default=1,
+              help="The number of processes to use.")
+def load_sample_data_parallel(tables, jobs):
+    """Load nonzero entries per sample of many tables."""
+    import sys
+    import redbiom.admin
+
+    tasks = []
+    for line in tables:
+        if not line.strip():
+            continue
+        context, tag, path = line.rstrip('\n').split('\t')
+        tasks.append((context, tag or None, path))
+
+    n_samples = 0
+    failed = 0
+    results = redbiom.admin.load_sample_data_parallel(tasks, jobs=jobs)
+    for done, (task, n_loaded, error) in enumerate(results, 1):
+        context, tag, path = task
+        if error is None:
+            n_samples += n_loaded
+            click.echo("[%d/%d] Loaded %d samples from %s into %s" %
+                       (done, len(tasks), n_loaded, path, context))
+        else:
+            failed += 1
+            click.echo("[%d/%d] Unable to load %s into %s: %s" %
+                       (done, len(tasks), path, context, error), err=True)
+
+    click.echo("Loaded %d samples from %d tables; %d failed" %
+               (n_samples, len(tasks) - failed, failed))
+    if failed:
+        sys.exit(1)
+
+
+@admin.command(name='compact')
+@click.option('--context', required=True, type=str,
+              help="The name of the context to compact.")
+@click.option('--full', default=False, is_flag=True,
+              help=("Compact all features rather than those loaded since "
+                    "they were last compacted."))
+def compact(context, full):
+    """Deduplicate and sort the sample data of features."""
+    import redbiom.admin
+    n_features, n_removed = redbiom.admin.compact_features(context,
+                                                           full=full)
+    click.echo("Compacted %d features, removing %d entries" %
+               (n_features, n_removed))
+
+
+@admin.command(name='delete-tag')
+@click.option('--context', required=True, type=str,
+              help="The name of the context to delete from.")
+@click.option('--tag', required=True, type=str,
+              help="The tag to delete (e.g., preparation ID).")
+def delete_tag(context, tag):
+    """Delete the samples of a tag."""
+    import redbiom.admin
+    n_deleted = redbiom.admin.delete_tag(context, tag)
+    click.echo("Deleted %d samples" % n_deleted)
+
+
+@admin.command(name='delete-studies')
+@click.option('--context', required=True, type=str,
+              help="The name of the context to delete from.")
+@click.option('--study-id', required=True, type=str, multiple=True,
+              help="The ID of a study to delete.")
+def delete_studies(context, study_id):
+    """Delete the samples of studies."""
+    import redbiom.admin
+    n_deleted = redbiom.admin.delete_studies_by_id(context, study_id)
+    click.echo("Deleted %d samples" % n_deleted)
+
+
 @admin.command(name='load-sample-metadata')
 @click.option('--metadata', required=True, type=click.Path(exists=True),
               help="The filepath to the sample metadata to load.")
-def load_sample_metadata(metadata):
+@click.option('--mass-insertion', default=False, is_flag=True)
+def load_sample_metadata(metadata, mass_insertion):
     """Load sample metadata."""
     import redbiom.admin
     import pandas as pd
     metadata = pd.read_csv(metadata, sep='\t', dtype=str,
                            keep_default_na=False, na_values=[])
-    n_loaded = redbiom.admin.load_sample_metadata(metadata)
-    click.echo("Loaded %d samples" % n_loaded)
+    n_loaded = redbiom.admin.load_sample_metadata(
+        metadata, redis_protocol=mass_insertion)
+
+    # stdout is reserved for the commands of a mass insertion
+    click.echo("Loaded %d samples" % n_loaded, err=mass_insertion)
 
 
 @admin.command(name='load-sample-metadata-search')
 @click.option('--metadata', required=True, type=click.Path(exists=True),
               help="The filepath to the sample metadata to load.")
-def load_sample_metadata_search(metadata):
+@click.option('--mass-insertion', default=False, is_flag=True)
+def load_sample_metadata_search(metadata, mass_insertion):
     """Load sample metadata."""
     import redbiom.admin
     import pandas as pd
     metadata = pd.read_csv(metadata, sep='\t', dtype=str,
                            keep_default_na=False, na_values=[])
-    n_values, n_cats = redbiom.admin.load_sample_metadata_full_search(metadata)
+    n_values, n_cats = redbiom.admin.load_sample_metadata_full_search(
+        metadata, redis_protocol=mass_insertion)
+
+    # stdout is reserved for the commands of a mass insertion
     click.echo("Found %d category stems and %d metadata value stems" %
-               (n_cats, n_values))
+               (n_cats, n_values), err=mass_insertion)
+
+
+@admin.command(name='build-dump')
+@click.option('--directory', required=True,
+              type=click.Path(exists=True, file_okay=False),
+              help=("The export to load. Sample metadata are read from "
+                    "<directory>/metadata, and tables from "
+                    "<directory>/<context>/<tag>.biom."))
+@click.option('--output', required=True, type=click.File('wb'),
+              help="Where to write the commands for redis-cli --pipe.")
+@click.option('--jobs', required=False, type=int, default=1,
+              help="The number of processes to use.")
+def build_dump(directory, output, jobs):
+    """Produce the commands to load an export into a fresh database."""
+    import redbiom.admin
+    summary = redbiom.admin.build_dump(directory, output, jobs=jobs)
+
+    # the output may be stdout
+    click.echo("Loaded %d samples of metadata and %d tables" %
+               (summary['samples'], summary['tables']), err=True)
+    for path in summary['skipped']:
+        click.echo("Omitted %s" % path, err=True)
 
 
 @admin.command(name='scripts-read-only')
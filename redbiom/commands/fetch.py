@@ -14,13 +14,17 @@ def fetch():
               help="The context to fetch from.")
 @click.option('--unambiguous', required=False, is_flag=True, default=False,
               help="Return ambiguous or unambiguous identifiers")
-def fetch_samples_contained(context, unambiguous):
+@click.option('--tag', required=False, type=str, default=None,
+              help=("Only return the samples of a tag (e.g., preparation "
+                    "ID)."))
+def fetch_samples_contained(context, unambiguous, tag):
     """Get samples within a context.
 
     Return all of the sample identifiers which are represented in a context.
     """
     import redbiom.fetch
-    for id_ in redbiom.fetch.samples_in_context(context, unambiguous):
+    for id_ in redbiom.fetch.samples_in_context(context, unambiguous,
+                                                tag=tag):
         click.echo(id_)
 
 
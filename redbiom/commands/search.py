@@ -3,7 +3,7 @@ import click
 from . import cli
 
 
-def _axis_search(from_, exact, context, ids, axis, min_count):
+def _axis_search(from_, exact, context, ids, axis, min_count, count=False):
     import redbiom._requests
     import redbiom.util
 
@@ -11,6 +11,12 @@ def _axis_search(from_, exact, context, ids, axis, min_count):
 
     it = redbiom.util.from_or_nargs(from_, ids)
 
+    if count:
+        # the cardinality is computed server-side without fetching ids
+        click.echo(redbiom.util.count_from(it, exact, axis, context,
+                                           min_count))
+        return
+
     # determine the opposite axis ids associated with query ids
     observed = redbiom.util.ids_from(it, exact, axis, context, min_count)
 
@@ -35,10 +41,13 @@ def search():
 @click.option('--min-count', required=False,
               type=click.IntRange(min=1), default=1,
               help="The minimum number of times the feature was observed.")
+@click.option('--count', is_flag=True, default=False,
+              help="Only report the number of samples found")
 @click.argument('features', nargs=-1)
-def search_features(from_, exact, context, features, min_count):
+def search_features(from_, exact, context, features, min_count, count):
     """Get samples containing features."""
-    _axis_search(from_, exact, context, features, 'feature', min_count)
+    _axis_search(from_, exact, context, features, 'feature', min_count,
+                 count)
 
 
 @search.command(name="samples")
@@ -53,8 +62,10 @@ def search_features(from_, exact, context, features, min_count):
 @click.option('--min-count', required=False,
               type=click.IntRange(min=1), default=1,
               help="The minimum number of times the feature was observed.")
+@click.option('--count', is_flag=True, default=False,
+              help="Only report the number of features found")
 @click.argument('samples', nargs=-1)
-def search_samples(from_, exact, context, samples, min_count):
+def search_samples(from_, exact, context, samples, min_count, count):
     """Get features present in samples."""
     import redbiom
     import redbiom._requests
@@ -64,14 +75,17 @@ def search_samples(from_, exact, context, samples, min_count):
     get = redbiom._requests.make_get(config)
     _, _, _, rb_ids = redbiom.util.resolve_ambiguities(context, samples, get)
     rb_ids = list(rb_ids)
-    _axis_search(from_, exact, context, iter(rb_ids), 'sample', min_count)
+    _axis_search(from_, exact, context, iter(rb_ids), 'sample', min_count,
+                 count)
 
 
 @search.command(name='metadata')
 @click.option('--categories', is_flag=True, required=False, default=False,
               help="Search for metadata categories instead of metadata values")
+@click.option('--count', is_flag=True, default=False,
+              help="Only report the number of samples or categories found")
 @click.argument('query', nargs=1)
-def search_metadata(query, categories):
+def search_metadata(query, categories, count):
     """Find samples or categories.
 
     The metadata search engine uses natural language processing to search for
@@ -115,8 +129,17 @@ def search_metadata(query, categories):
     "water".
 
     $ redbiom search metadata --categories "ph - water"
+
+    If only the number of matches is of interest, "--count" computes it
+    without transferring the matching identifiers.
+
+    $ redbiom search metadata --count antibiotics
     """
     import redbiom.search
+    if count:
+        click.echo(redbiom.search.metadata_full_count(query, categories))
+        return
+
     for i in redbiom.search.metadata_full(query, categories):
         click.echo(i)
 
@@ -85,26 +85,22 @@ def summarize_metadata(descending, categories):
         click.echo("%s\t%s" % (idx, val))
 
 
-def _summarize_id(context, category, id):
-    """Summarize the ID over the category"""
-    import redbiom.summarize
-    res = redbiom.summarize.category_from_features(context, category,
-                                                   [id], False)
-    res = res.value_counts()
-    counts = {i: c for i, c in zip(res.index, res)}
-    counts['feature'] = id
-    return counts
-
-
 @summarize.command(name='table')
 @click.option('--category', type=str, required=True)
 @click.option('--context', required=True, type=str)
 @click.option('--output', required=False, type=click.Path(exists=False),
               default=None)
-@click.option('--threads', type=int, default=1)
-@click.option('--verbosity', type=int, default=0)
+@click.option('--threads', type=int, default=1,
+              help="The number of worker processes to use.")
+@click.option('--verbosity', type=int, default=0,
+              help="If nonzero, report progress.")
+@click.option('--chunk-size', type=click.IntRange(min=1), default=1000,
+              help="The number of features handed to a worker at a time.")
 @click.option('--table', type=click.Path(exists=True), required=True)
-def summarize_table(category, context, output, threads, verbosity, table):
+@click.option('--format', 'format_', type=click.Choice(['tsv', 'biom']),
+              default='tsv', help="The output format.")
+def summarize_table(category, context, output, threads, verbosity, table,
+                    format_, chunk_size):
     """Summarize all features in a BIOM table.
 
     This command will assess, per feature, the number of samples that
@@ -117,18 +113,32 @@ def summarize_table(category, context, output, threads, verbosity, table):
         click.echo("%s is not found" % category, err=True)
         sys.exit(1)
 
+    if format_ == 'biom' and output is None:
+        import sys
+        click.echo("--output is required for BIOM output", err=True)
+        sys.exit(1)
+
     import biom
     table = biom.load_table(table)
 
-    import joblib
-    with joblib.parallel.Parallel(n_jobs=threads, verbose=verbosity) as par:
-        mappings = par(joblib.delayed(_summarize_id)(context, category, id)
-                       for id in table.ids(axis='observation'))
+    import redbiom.summarize
+    features = table.ids(axis='observation')
+    if verbosity:
+        with click.progressbar(length=len(features), label='Features',
+                               file=click.get_text_stream('stderr')) as bar:
+            df = redbiom.summarize.table(context, category, features,
+                                         jobs=threads, chunk_size=chunk_size,
+                                         progress=bar.update)
+    else:
+        df = redbiom.summarize.table(context, category, features,
+                                     jobs=threads, chunk_size=chunk_size)
 
-    import pandas as pd
-    df = pd.DataFrame(mappings)
-    df.set_index('feature', inplace=True)
-    df[df.isnull()] = 0
+    if format_ == 'biom':
+        import h5py
+        summary = biom.Table(df.values, list(df.index), list(df.columns))
+        with h5py.File(output, 'w') as fp:
+            summary.to_hdf5(fp, 'redbiom')
+        return
 
     tsv = df.to_csv(None, sep='\t', header=True, index=True)
     if output is None:
@@ -136,7 +146,6 @@ def summarize_table(category, context, output, threads, verbosity, table):
     else:
         with open(output, 'w') as fp:
             fp.write(tsv)
-    # TODO: should this output BIOM? It is a feature table.
 
 
 @summarize.command(name='features')
@@ -205,17 +214,9 @@ def taxonomy(from_, context, normalize_ranks, features):
     lineages = redbiom.fetch.taxon_ancestors(context, ids,
                                              normalize=normalize_ranks)
 
-    import skbio
-    tree = skbio.TreeNode.from_taxonomy([(i, l)
-                                         for i, l in zip(ids, lineages)])
+    import redbiom.summarize
+    summary = redbiom.summarize.taxonomy(lineages)
 
-    n_tips = float(len(list(tree.tips())))
     click.echo("Taxon\tCount\tFractionOfInput")
-    for n in tree.postorder(include_self=False):
-        if n.is_tip():
-            n.count = 1
-        else:
-            n.count = sum(c.count for c in n.children)
-            if not n.name.endswith('__'):
-                click.echo("%s\t%d\t%0.4f" % (n.name, n.count,
-                                              n.count / n_tips))
+    for name, count, fraction in summary.itertuples(index=False):
+        click.echo("%s\t%d\t%0.4f" % (name, count, fraction))
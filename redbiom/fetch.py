@@ -1,4 +1,4 @@
-def samples_in_context(context, unambiguous, get=None):
+def samples_in_context(context, unambiguous, get=None, tag=None):
     """Fetch samples in a context
 
     Parameters
@@ -10,6 +10,14 @@ def samples_in_context(context, unambiguous, get=None):
         identifiers.
     get : a make_get instance, optional
         A constructed get method.
+    tag : str, optional
+        If provided, only the samples of the tag (e.g., a preparation ID)
+        are returned. The samples loaded without a tag are those of UNTAGGED.
+
+    Notes
+    -----
+    The samples of each tag are indexed on load. Contexts loaded prior to
+    the index are scanned instead.
 
     Returns
     -------
@@ -24,6 +32,8 @@ def samples_in_context(context, unambiguous, get=None):
     Redis Command Summary
     ---------------------
     SMEMBERS <context>:samples-represented
+    SMEMBERS <context>:tag-members:<tag>
+    SSCAN <context>:samples-represented <cursor> MATCH <tag>_*
     """
     import redbiom
     import redbiom._requests
@@ -35,7 +45,13 @@ def samples_in_context(context, unambiguous, get=None):
 
     redbiom._requests.valid(context, get)
 
-    obs = get(context, 'SMEMBERS', 'samples-represented')
+    if tag is None:
+        obs = get(context, 'SMEMBERS', 'samples-represented')
+    elif redbiom._requests.context_flag(context, 'tag-members', get):
+        obs = get(context, 'SMEMBERS', 'tag-members:%s' % tag)
+    else:
+        obs = redbiom._requests.scan_set(get, context, 'samples-represented',
+                                         '%s_*' % tag)
 
     if not unambiguous:
         _, _, _, tagged_clean = redbiom.util.partition_samples_by_tags(obs)
@@ -287,8 +303,7 @@ def _biom_from_samples(context, samples, get=None, normalize_taxonomy=None):
 
     Redis command summary
     ---------------------
-    HMGET <context>:feature-index-inverted
-    EVALSHA <fetch-sample-sha1> 0 context <redbiom-id>
+    EVALSHA <fetch-samples-taxonomy-sha1> 0 <context> <redbiom-id> ...
     """
     from operator import itemgetter
     import scipy.sparse as ss
@@ -312,37 +327,53 @@ def _biom_from_samples(context, samples, get=None, normalize_taxonomy=None):
     stable_ids, unobserved, ambig_assoc, rimap = \
         redbiom.util.resolve_ambiguities(context, samples, get)
 
+    # the sample data, feature IDs and lineages are obtained together so
+    # that the feature indices are resolved once, server-side
+    fetch_samples = redbiom.admin.ScriptManager.get('fetch-samples-taxonomy')
+    ids = list(rimap)
     table_data = []
-    unique_indices = set()
-    fetch_sample = redbiom.admin.ScriptManager.get('fetch-sample')
-    for id_ in rimap:
+    features = {}
+    lineages = {}
+    found = False
+    for start in range(0, len(ids), 100):
         # 0 -> we're passing 0 keys, and instead using ARGV
-        data = se(fetch_sample, 0, context, id_)
-        table_data.append((id_, data))
-        unique_indices.update(data)
+        block, block_features, block_lineages, block_found = \
+            se(fetch_samples, 0, context, *ids[start:start + 100])
+        table_data.extend(block)
+        features.update(block_features)
+        lineages.update(block_lineages)
+        found = found or block_found
 
     # construct a mapping of
-    # {feature ID : index position in the BIOM table}
-    unique_indices_map = {observed: index
-                          for index, observed in enumerate(unique_indices)}
+    # {feature index : index position in the BIOM table}
+    unique_indices_map = {}
+    rows = []
+    cols = []
+    data = []
+    for col, (sample, indices, counts) in enumerate(table_data):
+        for index, count in zip(indices, counts):
+            row = unique_indices_map.setdefault(index,
+                                                len(unique_indices_map))
+            rows.append(row)
+            cols.append(col)
+            data.append(count)
 
     # pull out the feature and sample IDs in the desired ordering
-    obs_ids = [id_ for id_, _ in sorted(unique_indices_map.items(),
-                                        key=itemgetter(1))]
-    sample_ids = [id_ for id_, _ in table_data]
+    obs_indices = [index for index, _ in sorted(unique_indices_map.items(),
+                                                key=itemgetter(1))]
+    obs_ids = [features[index] for index in obs_indices]
+    sample_ids = [sample for sample, _, _ in table_data]
 
     # fill in the matrix
-    mat = ss.lil_matrix((len(unique_indices), len(table_data)))
-    for col, (sample, col_data) in enumerate(table_data):
-        # since this isn't dense, hopefully roworder doesn't hose us
-        for obs_id, value in col_data.items():
-            mat[unique_indices_map[obs_id], col] = value
-
-    lineages = taxon_ancestors(context, obs_ids, get,
-                               normalize=normalize_taxonomy)
-
-    if lineages is not None:
-        obs_md = [{'taxonomy': lineage} for lineage in lineages]
+    mat = ss.coo_matrix((data, (rows, cols)),
+                        shape=(len(obs_ids), len(sample_ids)),
+                        dtype=float).tocsr()
+
+    if found:
+        obs_md = [{'taxonomy': taxon}
+                  for taxon in _normalize_lineages(
+                      [list(lineages[index]) for index in obs_indices],
+                      normalize_taxonomy)]
     else:
         obs_md = None
 
@@ -366,6 +397,13 @@ def taxon_ancestors(context, ids, get=None, normalize=None):
     normalize : list, optional
         The ranks to normalize a lineage too (e.g., [k, p, c, o, f, g, s])
 
+    Notes
+    -----
+    If a cache directory is configured, the taxonomy parents of the context
+    are stored locally and the lineages are formed without further requests
+    for as long as the taxonomy version of the context is unchanged.
+    Otherwise, complete lineages are obtained server-side in blocks.
+
     Returns
     -------
     list of list
@@ -373,69 +411,123 @@ def taxon_ancestors(context, ids, get=None, normalize=None):
 
     Redis Command Summary
     ---------------------
-    HMGET <context>:taxonomy-parents <child> ... <child>
+    HGETALL <context>:state
+    EVALSHA <taxon-ancestors-sha1> 0 <context> <id> ... <id>
+    HGET <context>:state taxonomy-version
+    HMGET <context>:feature-index <id> ... <id>
+    HGETALL <context>:taxonomy-parents
     """
-    from future.moves.itertools import zip_longest
+    import redbiom
     import redbiom._requests
+    import redbiom.admin
 
+    config = redbiom.get_config()
     if get is None:
-        import redbiom
-        config = redbiom.get_config()
         get = redbiom._requests.make_get(config)
 
-    hmgetter = redbiom._requests.buffered
-    remapped_bulk = hmgetter(iter(ids), None, 'HMGET', context,
-                             get=get, buffer_size=100,
-                             multikey='feature-index')
+    # there is nothing to resolve if the context lacks taxonomy
+    if not redbiom._requests.context_flag(context, 'has-taxonomy', get):
+        return None
 
-    # map the feature identifier to an internal ID
-    # if an internal ID does not exist, keep the provided ID
-    # the provided ID is kept in the event a taxon name such as
-    # p__Firmicutes is provided
-    remapped = {name: id_ if id_ is not None else name
-                for names, idx in remapped_bulk
-                for name, id_ in zip(names, idx)}
+    ids = list(ids)
+    if config.get('cache_dir'):
+        lineages = _cached_lineages(context, ids, config['cache_dir'], get)
+    else:
+        se = redbiom._requests.make_script_exec(config)
+        ancestors = redbiom.admin.ScriptManager.get('taxon-ancestors')
 
-    # bulk gather the taxonomy information for all the tips and their parents
-    to_get = list(remapped.values())
-    child_parent = {}
+        lineages = []
+        found = False
+        for start in range(0, len(ids), 100):
+            block, block_found = se(ancestors, 0, context,
+                                    *ids[start:start + 100])
+            lineages.extend(list(lineage) for lineage in block)
+            found = found or block_found
 
-    while to_get:
-        key = 'taxonomy-parents'
-        getter = hmgetter(iter(to_get), None, 'HMGET',
-                          context, get=get,
-                          buffer_size=100, multikey=key)
+        if not found:
+            lineages = None
+
+    if lineages is None:
+        return None
 
-        new_to_get = set()
-        for block in getter:
-            for child, parent in zip(*block):
-                if parent is None:
-                    continue
+    return _normalize_lineages(lineages, normalize)
 
-                child_parent[child] = parent
-                new_to_get.add(parent)
-        to_get = new_to_get
+
+def _normalize_lineages(lineages, normalize):
+    """Pad lineages to greengenes like strings if normalize is specified"""
+    from future.moves.itertools import zip_longest
+
+    if normalize is None:
+        return lineages
+
+    return [[taxon if taxon else "%s__" % r
+             for taxon, r in zip_longest(lineage, normalize,
+                                         fillvalue=False)]
+            for lineage in lineages]
+
+
+def _cached_lineages(context, ids, cache_dir, get):
+    """Form lineages from a locally cached copy of the taxonomy parents"""
+    import os
+    import json
+    import hashlib
+    import redbiom
+    import redbiom._requests
+
+    version = get(context, 'HGET', 'state/taxonomy-version')
+
+    # context names are not assured to be safe file names, and the same
+    # context name may be used on different hosts
+    hostname = redbiom.get_config()['hostname']
+    name = hashlib.sha1(('%s\n%s' % (hostname, context)).encode('utf-8'))
+    path = os.path.join(cache_dir,
+                        'taxonomy-parents-%s.json' % name.hexdigest())
+
+    # without a version, a cached copy cannot be known to be current
+    child_parent = None
+    if version is not None and os.path.exists(path):
+        with open(path) as fp:
+            cached = json.load(fp)
+        if cached['version'] == version:
+            child_parent = cached['parents']
+
+    if child_parent is None:
+        child_parent = get(context, 'HGETALL', 'taxonomy-parents')
+
+        if version is not None:
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+
+            # write then rename so concurrent readers do not observe a
+            # partial file
+            tmp = '%s.%d' % (path, os.getpid())
+            with open(tmp, 'w') as fp:
+                json.dump({'version': version, 'parents': child_parent}, fp)
+            os.rename(tmp, path)
 
     if not child_parent:
         return None
 
-    # form lineages from the child -> parent relationships
+    # map the feature identifier to an internal ID
+    # if an internal ID does not exist, keep the provided ID
+    # the provided ID is kept in the event a taxon name such as
+    # p__Firmicutes is provided
+    remapped_bulk = redbiom._requests.buffered(iter(ids), None, 'HMGET',
+                                               context, get=get,
+                                               buffer_size=100,
+                                               multikey='feature-index')
+    remapped = {name: id_ if id_ is not None else name
+                for names, idx in remapped_bulk
+                for name, id_ in zip(names, idx)}
+
     lineages = []
     for id_ in ids:
         lineage = []
-        current = remapped[id_]
+        current = child_parent.get(remapped[id_])
         while current is not None:
+            lineage.append(current)
             current = child_parent.get(current)
-            if current is not None:
-                lineage.append(current)
-        lineage = lineage[::-1]
-
-        # normalize if necessary to greengenes like strings
-        if normalize is not None:
-            lineage = [l if l else "%s__" % r
-                       for l, r in zip_longest(lineage, normalize,
-                                               fillvalue=False)]
-        lineages.append(lineage)
+        lineages.append(lineage[::-1])
 
     return lineages
 
@@ -450,7 +542,12 @@ def taxon_descendents(context, taxon, get=None):
     taxon : str
         The taxon to search for
     get : function, optional
-        A get method
+        A get method. Unused, as the descent is performed server-side.
+
+    Notes
+    -----
+    If the context holds a complete taxon-tips index, the tips are obtained
+    from it directly. Otherwise, the taxonomy is descended.
 
     Returns
     -------
@@ -459,43 +556,23 @@ def taxon_descendents(context, taxon, get=None):
 
     Redis Command Summary
     ---------------------
-    SMEMBERS <context>:taxonomy-children:<taxon>
+    EVALSHA <taxon-descendents-sha1> 0 <context> <taxon>
     """
+    import redbiom
     import redbiom._requests
+    import redbiom.admin
 
-    if get is None:
-        import redbiom
-        config = redbiom.get_config()
-        get = redbiom._requests.make_get(config)
-    hmgetter = redbiom._requests.buffered
-
-    to_get = [(None, taxon), ]
-    to_keep = set()
-    while to_get:
-        new_to_get = []
-        for parent, taxon in to_get:
-            if taxon == 'has-terminal':
-                tips = get(context, 'SMEMBERS', 'terminal-of:%s' % parent)
-                to_keep.update(set(tips))
-            else:
-                gotten = get(context, 'SMEMBERS',
-                             'taxonomy-children:%s' % taxon)
-                new_to_get.extend([(taxon, child) for child in gotten])
-        to_get = new_to_get
-
-    remapped_bulk = hmgetter(to_keep, None, 'HMGET', context,
-                             get=get, buffer_size=100,
-                             multikey='feature-index-inverted')
-
-    remapped = {name
-                for idx, names in remapped_bulk
-                for id_, name in zip(idx, names)}
-
-    if None in remapped:
+    config = redbiom.get_config()
+    se = redbiom._requests.make_script_exec(config)
+
+    descender = redbiom.admin.ScriptManager.get('taxon-descendents')
+    names, unresolved = se(descender, 0, context, taxon)
+
+    if unresolved:
         # this should not happen and is a consistency check
         raise ValueError("An unassociated index has been found")
 
-    return remapped
+    return set(names)
 
 
 def category_sample_values(category, samples=None):
@@ -562,24 +639,28 @@ def sample_counts_per_category(categories=None):
 
     Redis command summary
     ---------------------
-    SMEMBERS metadata:categories-represented
-    HLEN metadata:category:<category>
+    EVALSHA <category-counts-sha1> 0 [<category> ... <category>]
     """
     import redbiom
     import redbiom._requests
+    import redbiom.admin
     import pandas as pd
 
-    get = redbiom._requests.make_get(redbiom.get_config())
+    se = redbiom._requests.make_script_exec(redbiom.get_config())
+    counter = redbiom.admin.ScriptManager.get('category-counts')
 
     if categories is None:
-        categories = list(get('metadata', 'SMEMBERS',
-                          'categories-represented'))
-    results = []
-    for category in categories:
-        key = 'category:%s' % category
-        results.append(int(get('metadata', 'HLEN', key)))
-
-    return pd.Series(results, index=categories)
+        # all represented categories are counted server-side
+        counts = list(se(counter, 0))
+    else:
+        categories = list(categories)
+        counts = []
+        for start in range(0, len(categories), 100):
+            counts.extend(se(counter, 0, *categories[start:start + 100]))
+
+    index = [category for category, _ in counts]
+    results = [int(n) for _, n in counts]
+    return pd.Series(results, index=index)
 
 
 def metadata(where=None, tag=None, restrict_to=None):
@@ -1,105 +1,264 @@
-def process(study):
-    id_str, artifacts = study.split(',', 1)
+import hashlib
+import json
+import os
 
-    #Id processing
-    id_num = int(id_str.replace('(', ''))
 
-    #Artifact processing
-    artifacts_set = set(artifacts.replace('[', '').replace(']','').replace(' ','').split('),'))
-    artifacts_data = tuple(tuple(a.strip().replace('(', '').replace(')', '').replace("u'", "").replace("'", "").split(',')) for a in artifacts_set)
-    artifacts_data = tuple(tuple(a for a in artifacts_data))
+# The state of a nightly update is a JSON lines file, with one record per
+# artifact of the form:
+#
+#   {"study": 10317, "tag": "12345", "context": "Deblur-...", "path": "...",
+#    "hash": <sha1 of the BIOM file>,
+#    "samples": {<sample_id>: <sha1 of the sample data>, ...}}
+#
+# The sample IDs are those of the BIOM table, i.e., without their tag.
 
-    return id_num, artifacts_data
+
+def file_hash(path, block_size=2 ** 20):
+    """The SHA-1 of the content of a file
+
+    Parameters
+    ----------
+    path : str
+        The file to hash.
+    block_size : int, optional
+        The number of bytes to read at a time.
+
+    Returns
+    -------
+    str
+        The hex digest of the file content.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fp:
+        for block in iter(lambda: fp.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sample_hashes(table):
+    """The SHA-1 of the data of each sample of a table
+
+    Parameters
+    ----------
+    table : biom.Table
+        The table to hash.
+
+    Notes
+    -----
+    A sample is hashed over its nonzero features and counts, ordered by
+    feature ID, so the hash is independent of the order of the features in
+    the table and of the other samples.
+
+    Returns
+    -------
+    dict of {str: str}
+        The hex digest of each sample.
+    """
+    features = table.ids(axis='observation')
+    hashes = {}
+    for values, id_, _ in table.iter(axis='sample', dense=False):
+        pairs = sorted(zip(features[values.indices], values.data))
+        digest = hashlib.sha1()
+        for feature, count in pairs:
+            digest.update(('%s\t%r\n' % (feature, float(count))).encode())
+        hashes[id_] = digest.hexdigest()
+    return hashes
+
+
+def artifact_state(study_id, tag, context, path, previous=None):
+    """Describe the content of an artifact
+
+    Parameters
+    ----------
+    study_id : int
+        The study the artifact belongs to.
+    tag : str
+        The tag of the artifact, its ID.
+    context : str
+        The context the artifact is loaded into.
+    path : str
+        The BIOM table of the artifact.
+    previous : dict, optional
+        The record of the artifact from the prior update. Its sample hashes
+        are reused if the file is unchanged, without reading the table.
+
+    Returns
+    -------
+    dict or None
+        The record of the artifact, or the previous record if the table
+        cannot be found, such that an unavailable table does not cause its
+        samples to be removed.
+    """
+    import biom
+
+    if not os.path.exists(path):
+        return previous
+
+    digest = file_hash(path)
+    if previous is not None and previous['hash'] == digest:
+        samples = previous['samples']
+    else:
+        samples = sample_hashes(biom.load_table(path))
+
+    return {'study': study_id, 'tag': tag, 'context': context, 'path': path,
+            'hash': digest, 'samples': samples}
 
 
 def load_state_file(filename):
-    try:
-        with open(filename, 'r') as data:
-            return [process(study) for study in data]
-    except IOError:
-        raise
+    """Read the state of a prior update
+
+    Parameters
+    ----------
+    filename : str
+        The JSON lines state file.
+
+    Returns
+    -------
+    dict of {(str, str): dict}
+        The record of each artifact keyed by its context and tag. The state
+        is empty if the file does not exist, such that everything is loaded.
+    """
+    if not os.path.exists(filename):
+        return {}
+
+    state = {}
+    with open(filename) as data:
+        for line in data:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            state[(record['context'], record['tag'])] = record
+    return state
 
 
-def write_data_to_verify_integrity(filename, study_data):
-    try:
-        with open(filename, 'w') as out:
-            for item in study_data:
-                print(item, file=out)
-    except IOError:
-        raise
+def write_state_file(filename, state):
+    """Write the state of an update
 
+    Parameters
+    ----------
+    filename : str
+        The JSON lines state file.
+    state : dict of {(str, str): dict}
+        The record of each artifact keyed by its context and tag.
 
-def out(data, filename, suffix='.out'):
-    try:
-        with open(filename + suffix, 'w') as out_file:
-            print(data, file=out_file)
-    except IOError:
-        raise
+    Notes
+    -----
+    The state is written to a temporary file which then replaces filename,
+    so an interrupted write does not lose the prior state.
+    """
+    tmp = filename + '.tmp'
+    with open(tmp, 'w') as out:
+        for key in sorted(state):
+            out.write(json.dumps(state[key], sort_keys=True))
+            out.write('\n')
+    os.rename(tmp, filename)
 
 
-def diff(study_data_old, study_data_new):
-    '''
-    Takes two data collections (as tuples), the old and the new, that represent study data from Qiita, and diffs these to see what has been
-    added, deleted, and modified.
+def read_journal(filename):
+    """Read the units of work completed by an interrupted update
 
-    Parameters:
-        study_data_old: The old data
-        study_data_new: The new data
+    Parameters
+    ----------
+    filename : str
+        The JSON lines journal.
+
+    Notes
+    -----
+    A line which was not completely written, as the update was interrupted
+    while writing it, is ignored.
 
     Returns
-        The set of changes in the new file relative to the old file, as a tuple of sets: (added, deleted, modified).
-        The added and deleted sets contain the study ids of what was added or deleted; the modified set contains the study id, artifact id, 
-        and artifact data that was changed.
-    '''
-    ids_old = {sd[0] for sd in study_data_old}
-    ids_new = {sd[0] for sd in study_data_new}
-
-    '''
-    We start by processing study IDs
-        If and only if it has been added, it is in the new set but now the old one
-        If and only if it had been deleted, it is in the old set but not the new one
-        If it has been modified, it must be in both sets. Items in both sets are not necessarily modified, only potentially.
-    I used a single sided difference (- rather than ^) since doing ^ does not differentiate added and deleted
-    '''
-    added = ids_new - ids_old
-    deleted = ids_old - ids_new
-    potentially_updated = ids_new - added
-
-    '''
-    For those studies that may have been modified, we need to look at their data.
-    Anything that has been modified will have the property that it is different in the new set relative to its entry in the old set.
-        Changes at or below the artifact level are considered study modifications.
-    We do not care where the changes are in the old set, but rather only where they are in the new set. So we can take a sided difference.
-    I did not turn study_data_old and study_data_new into sets and take their difference since that would make it harder to identify which artifact had been changed.
-    '''
-    ids_tags_data_old = {(sd[0], arts[0], arts[1:])
-                    for sd in study_data_old
-                     if sd[0] in potentially_updated
-                      for arts in sd[1]}
-    ids_tags_data_new = {(sd[0], arts[0], arts[1:])
-                    for sd in study_data_new
-                     if sd[0] in potentially_updated
-                      for arts in sd[1]}
-    modified = ids_tags_data_new - ids_tags_data_old
-
-    return added, deleted, modified
-
-'''
-if __name__ == "__main__":
-    #Get the study data from files
-    study_data_old = load_state_file('truncated.json')
-    study_data_new = load_state_file('truncated.1.json')
-
-    #Write out so it can be seen that the new data structures have all the same data as the old
-    write_data_to_verify_integrity('reconsituted.0.json', study_data_old)
-    write_data_to_verify_integrity('reconsituted.1.json', study_data_new)
-
-    #Get what has been added, modified, and deleted and print as proof-of-concept
-    added, deleted, modified  = diff(study_data_old, study_data_new)
-    print('mod')
-    print(modified)
-    print('del')
-    print(deleted)
-    print('add')
-    print(added)
-'''
\ No newline at end of file
+    -------
+    dict of {(str, str, str): dict}
+        The record of the artifact each unit of work was performed for, keyed
+        by the context, tag and step of the unit. The journal is empty if the
+        file does not exist.
+    """
+    if not os.path.exists(filename):
+        return {}
+
+    journal = {}
+    with open(filename) as data:
+        for line in data:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            record = entry['record']
+            journal[(record['context'], record['tag'], entry['step'])] = record
+    return journal
+
+
+def append_journal(filename, step, record):
+    """Note a completed unit of work
+
+    Parameters
+    ----------
+    filename : str
+        The JSON lines journal.
+    step : str
+        The step completed, e.g., "deleted" or "loaded".
+    record : dict
+        The record of the artifact the work was performed for.
+
+    Notes
+    -----
+    The entry is flushed to disk before returning. If the journal ends in a
+    line which was not completely written, the entry starts a new line so
+    that it is not lost along with that line.
+    """
+    entry = json.dumps({'step': step, 'record': record}, sort_keys=True)
+    with open(filename, 'ab+') as out:
+        out.seek(0, os.SEEK_END)
+        if out.tell() > 0:
+            out.seek(-1, os.SEEK_END)
+            if out.read(1) != b'\n':
+                entry = '\n' + entry
+        out.write((entry + '\n').encode())
+        out.flush()
+        os.fsync(out.fileno())
+
+
+def diff(state_old, state_new):
+    """Determine the samples to delete and to load per artifact
+
+    Parameters
+    ----------
+    state_old : dict of {(str, str): dict}
+        The state of the prior update, see load_state_file.
+    state_new : dict of {(str, str): dict}
+        The current state.
+
+    Notes
+    -----
+    A sample is deleted if it is no longer in its artifact, or if its data
+    have changed, in which case it is loaded again. A sample is loaded if it
+    is new to its artifact. Artifacts whose file is unchanged are not
+    examined further.
+
+    Returns
+    -------
+    dict of {(str, str): (set, set)}
+        The IDs of the samples to delete and to load, without their tag,
+        keyed by the context and tag of the artifact. Artifacts without
+        changes are omitted.
+    """
+    changes = {}
+    for key in set(state_old) | set(state_new):
+        old = state_old.get(key)
+        new = state_new.get(key)
+
+        if old is not None and new is not None and old['hash'] == new['hash']:
+            continue
+
+        old_samples = {} if old is None else old['samples']
+        new_samples = {} if new is None else new['samples']
+
+        to_load = {id_ for id_, digest in new_samples.items()
+                   if old_samples.get(id_) != digest}
+        to_delete = {id_ for id_ in old_samples
+                     if id_ not in new_samples or id_ in to_load}
+
+        if to_load or to_delete:
+            changes[key] = (to_delete, to_load)
+    return changes
@@ -2,13 +2,11 @@ import pandas as pd
 #import qiita_db
 #from qiita_db.util import get_artifacts_information
 import biom
-import joblib
 import os
 from collections import defaultdict
 import redbiom.admin
 import json
 import hashlib
-import random
 import time
 from redbiom.nightly import diff
 
@@ -39,6 +37,7 @@ def get_name_and_description(art):
     be safely partitioned by the specific runtime parameters. The runtime
     parameters themselves are returned as a description of the context.
     """
+    import qiita_db.util
     art_info = qiita_db.util.get_artifacts_information([art.id])[0]
     pt = art.prep_templates[0].to_dataframe()
 
@@ -149,6 +148,7 @@ def load_study_metadata(ids_tags_contexts_paths):
 
     preps = []
     for _, tag, _, _ in ids_tags_contexts_paths:
+        import qiita_db.artifact
         art = qiita_db.artifact.Artifact(tag)
         pt = art.prep_templates[0].to_dataframe()
 
@@ -192,16 +192,12 @@ def load_sample_data(tag, context, path):
 
 def delete_sample_data(study_id, tag, context, path):
     import traceback
-    if not os.path.exists(path):
-        print("Unable to find: %s" % path)
-        return 0
-
-    table = biom.load_table(path)
     try:
-        ndeleted = redbiom.admin.delete_studies_by_id(context, tag)
+        ndeleted = redbiom.admin.delete_tag(context, tag)
     except ValueError:
-        print("unable to load: %s, %s, %s" % (str(tag), str(context), str(path)))
-        nsdat = 0
+        print("unable to delete: %s, %s, %s" % (str(tag), str(context),
+                                                str(path)))
+        ndeleted = 0
     except Exception as e:
         # there are some studies in which there are samples in the biom table
         # which lack metadata
@@ -240,94 +236,215 @@ def load_study_metadata_of_list(studies_sublist, attempt_load=True):
     return ids_tags_contexts_paths
 
 
-def equal_slices(super_list, sublist_number):
+def _run_timed(args):
+    """Run a task, noting the worker and the time taken"""
+    index, func, task = args
+    start = time.time()
+    result = func(*task)
+    return index, os.getpid(), time.time() - start, result
+
+
+def schedule(func, tasks, sizes, jobs=8, unit='bytes'):
     """
-    Given a master list, returns a list of sub-lists that all have
-    length slice_length (except the last one, which will be larger
-    if len(list) is not divisible by slice_length)
+    Run func over tasks in parallel, largest first, from a queue shared by
+    the workers. A worker takes the next task as soon as it is idle, so a
+    large task does not hold up the tasks behind it. The throughput of each
+    worker is reported on completion.
 
     Parameters:
-        super_list: The super list from which sub-lists are to
-        be created
-        sublist_number: The number of sublists to create
+        func: a module level function, called with the arguments of a task
+        tasks: a list of tuples of arguments
+        sizes: the size of each task, e.g., its BIOM file size
+        jobs: the number of processes to use
+        unit: the unit of the sizes, for the report
+
+    Returns
+        The result of each task, in the order of tasks
     """
+    import multiprocessing
 
-    slice_location_multiples = int(len(super_list) / (sublist_number))
-    slices = []
-    for i in range(0, sublist_number):
-        start = i * slice_location_multiples
-        end = (i + 1) * slice_location_multiples
-        slices.append(super_list[start: end])
-    slices.append(super_list[end:])
+    order = sorted(range(len(tasks)), key=lambda i: sizes[i], reverse=True)
+    queue = [(i, func, tasks[i]) for i in order]
 
-    return slices
+    pool = None
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs)
+        imap_unordered = pool.imap_unordered
+    else:
+        imap_unordered = map
 
+    results = [None] * len(tasks)
+    throughput = defaultdict(lambda: [0, 0, 0.0])
+    try:
+        for i, worker, elapsed, result in imap_unordered(_run_timed, queue):
+            results[i] = result
+            stats = throughput[worker]
+            stats[0] += 1
+            stats[1] += sizes[i]
+            stats[2] += elapsed
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    for worker, (n, size, elapsed) in sorted(throughput.items()):
+        rate = size / elapsed if elapsed else 0.0
+        print("worker %d: %d tasks, %d %s in %.1fs (%.1f %s/s)" %
+              (worker, n, size, unit, elapsed, rate, unit))
+
+    return results
+
+
+def gather_ids_tags_contexts_paths(jobs=8):
+    """
+    Obtain the study ID, tag, context and BIOM path of every usable
+    artifact of the public studies in Qiita.
 
-def update():
-    # Take redbiom out of read-only mode so that it can be updated
-    redbiom.admin.ScriptManager.load_scripts(read_only=False)
+    Parameters:
+        jobs: the number of processes to use
+    """
+    import qiita_db.study
 
-    # Get studies and shuffle them randomly so study sizes are
-    # homogenusously distributed (on average)
-    '''studies = list(qiita_db.study.Study.get_by_status('public'))
-    random.shuffle(studies)
+    # Each study is a task of its own, so the workers balance themselves
+    # however the study sizes are distributed
+    studies = list(qiita_db.study.Study.get_by_status('public'))
+    results = schedule(load_study_metadata_of_list,
+                       [([s], ) for s in studies], [1] * len(studies),
+                       jobs=jobs, unit='studies')
 
-    # Split the list into 8 equally-lengthed parts, and load
-    # those into a master list
-    sub_lists = equal_slices(studies, 8)
+    return [entry for result in results for entry in result]
 
-    # Process the sub-arrays in parallel on eight CPUs in parallel
-    ids_tags_contexts_paths = []
-    with joblib.parallel.Parallel(n_jobs=8, verbose=50) as par:
-        ids_tags_contexts_paths.append(par(joblib.delayed(load_study_metadata_of_list)(sub_lists[i])
-                                    for i in range(len(sub_lists))))
-
-    # Diff the two files so I can know what to add, remove,
-    # and modify
-    study_data_old_name = "study_data_old.out"
-    study_data_old = diff.load_state_file(study_data_old_name)
-    study_data_new = tuple(ids_tags_contexts_paths)
-    added, deleted, modified = diff.diff(study_data_old, study_data_new)
-    modified_study_ids = [item[0] for item in modified]'''
-
-    #temp for testing
-    study_data_old_name = "truncated.json"
-    study_data_old = diff.load_state_file(study_data_old_name)
-    study_data_new = diff.load_state_file('output.json')
-    added, deleted, modified = diff.diff(study_data_old, study_data_new)
-    modified_study_ids = [item[0] for item in modified]
 
-    ids_tags_contexts_paths = []
-    for study_data in study_data_new:
-        study_id = study_data[0]
-        arts = study_data[1]
-        for art in arts:
-            if(len(art) == 3):
-                ids_tags_contexts_paths.append((study_id, art[0], art[1], art[2]))
-            else:
-                ids_tags_contexts_paths.append((study_id, '', '', ''))
+def update(state_filename='study_data.jsonl', ids_tags_contexts_paths=None):
+    """
+    Bring redbiom up to date with the artifacts, loading and deleting only
+    the samples which changed since the last update.
 
-    # Load metadata into redbiom
-    '''with joblib.parallel.Parallel(n_jobs=8, verbose=50) as par:
-        par(joblib.delayed(load_study_metadata)(entry)
-                    for entry in ids_tags_contexts_paths)'''
-    with joblib.parallel.Parallel(n_jobs=8, verbose=50) as par:
-        nsamp = par(joblib.delayed(load_sample_data)(t, c, p)
-                    for i, t, c, p in ids_tags_contexts_paths
-                      if i in modified_study_ids or i in added)
-    #And delete anything that is not in the new set
-    with joblib.parallel.Parallel(n_jobs=8, verbose=50) as par:
-        nsamp = par(joblib.delayed(delete_sample_data)(i, t, c, p)
-                    for i, t, c, p in ids_tags_contexts_paths
-                      if i in deleted)
+    Each artifact deleted from or loaded is noted in a journal next to the
+    state file, so an update which is interrupted resumes from where it
+    stopped rather than repeating the work.
+
+    Parameters:
+        state_filename: the JSON lines file holding the state of the last
+        update, see diff.load_state_file. It is replaced on completion.
+        ids_tags_contexts_paths: the study ID, tag, context and BIOM path
+        of each artifact. Defaults to the public artifacts in Qiita.
+    """
+    # Take redbiom out of read-only mode so that it can be updated
+    redbiom.admin.ScriptManager.load_scripts(read_only=False)
+
+    if ids_tags_contexts_paths is None:
+        ids_tags_contexts_paths = gather_ids_tags_contexts_paths()
+
+    journal_filename = state_filename + '.journal'
+    journal = diff.read_journal(journal_filename)
+
+    def journaled(c, t):
+        return journal.get((c, t, 'loaded'), journal.get((c, t, 'deleted')))
+
+    # Describe each artifact by the hash of its table and of each of its
+    # samples. Tables whose hash is unchanged, including those described by
+    # an interrupted update, are not read again
+    state_old = diff.load_state_file(state_filename)
+    tasks = [(i, t, c, p, journaled(c, t) or state_old.get((c, t)))
+             for i, t, c, p in ids_tags_contexts_paths]
+    sizes = [os.path.getsize(p) if os.path.exists(p) else 0
+             for i, t, c, p in ids_tags_contexts_paths]
+    records = schedule(diff.artifact_state, tasks, sizes, jobs=8)
+    state_new = {(r['context'], r['tag']): r for r in records
+                 if r is not None}
+    changes = diff.diff(state_old, state_new)
+
+    def done(c, t, step):
+        record = state_new.get((c, t), state_old.get((c, t)))
+        entry = journal.get((c, t, step))
+        if entry is None or record is None:
+            return False
+        return entry['hash'] == record['hash']
+
+    # An interrupted update may have deleted or loaded the samples of a
+    # table which has since changed again, so those are reconciled as well
+    stale = {}
+    for (c, t, step), record in journal.items():
+        if done(c, t, step):
+            continue
+        stale[(c, t)] = record
+        current = {} if (c, t) not in state_new else \
+            {(c, t): state_new[(c, t)]}
+        for key, (to_delete, to_load) in \
+                diff.diff({(c, t): record}, current).items():
+            pending = changes.setdefault(key, (set(), set()))
+            pending[0].update(to_delete)
+            pending[1].update(to_load)
+
+    # Delete anything that is not in the new set, and the samples whose data
+    # changed, as a load skips the samples which are already represented.
+    # The metadata of samples which remain in their artifact are retained
+    for (c, t), (to_delete, to_load) in sorted(changes.items()):
+        if done(c, t, 'deleted') or done(c, t, 'loaded'):
+            continue
+        if (c, t) not in state_new:
+            old = state_old.get((c, t), stale.get((c, t)))
+            delete_sample_data(old['study'], t, c, old['path'])
+            diff.append_journal(journal_filename, 'deleted', old)
+        elif to_delete:
+            redbiom.admin.delete_sample_data(
+                c, ['%s_%s' % (t, i) for i in to_delete])
+            diff.append_journal(journal_filename, 'deleted',
+                                state_new[(c, t)])
+
+    # Load the tables with new or changed samples; only those samples are
+    # novel to the context. The largest tables are started first, and the
+    # workers take the next table as they finish
+    def retry(c, t):
+        # keep the prior state so the table is retried by the next update
+        if (c, t) in state_old:
+            state_new[(c, t)] = state_old[(c, t)]
+        else:
+            del state_new[(c, t)]
+
+    tables = []
+    for (c, t), (to_delete, to_load) in sorted(changes.items()):
+        if not to_load or done(c, t, 'loaded'):
+            continue
+        p = state_new[(c, t)]['path']
+        # a table described by an interrupted update may since have gone
+        if not os.path.exists(p):
+            print("Unable to find: %s" % p)
+            retry(c, t)
+            continue
+        tables.append((c, t, p))
+    tables.sort(key=lambda task: os.path.getsize(task[2]), reverse=True)
+    start = time.time()
+    nsamp = []
+    for (c, t, p), n, error in redbiom.admin.load_sample_data_parallel(
+            tables, jobs=8):
+        if error is not None:
+            print("unable to load: %s, %s, %s; %s" % (str(t), str(c),
+                                                      str(p), error))
+            retry(c, t)
+        else:
+            diff.append_journal(journal_filename, 'loaded',
+                                state_new[(c, t)])
+        nsamp.append(n)
+    print("loaded %d samples from %d tables in %.1fs" %
+          (sum(nsamp), len(tables), time.time() - start))
+
+    # Keep the feature lists of the contexts loaded into compact, including
+    # those loaded by an interrupted update
+    for c in sorted({c for (c, t), (to_delete, to_load) in changes.items()
+                     if to_load}):
+        redbiom.admin.compact_features(c)
 
     # Put redbiom back into read-only mode for security
     redbiom.admin.ScriptManager.load_scripts(read_only=True)
-    
-    #Now that data has bee uploaded, write the most recent data down as the "old" data
-    with open(study_data_old_name, 'w') as last_study_data:
-        print(study_data_new, file=last_study_data)
-    
+
+    # Now that data has been uploaded, write the most recent data down as the
+    # "old" data, at which point the journal is no longer needed
+    diff.write_state_file(state_filename, state_new)
+    if os.path.exists(journal_filename):
+        os.remove(journal_filename)
+
     #Old method
     '''
     # Now load the data into redbiom
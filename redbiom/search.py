@@ -22,14 +22,10 @@ def metadata_full(query, categories=False, get=None):
     set
         The observed sample IDs
     """
-    from os.path import join, dirname
     import redbiom
     import redbiom.set_expr
     import redbiom.where_expr
     import redbiom._requests
-    import redbiom.util
-    import functools
-    import nltk
 
     if get is None:
         config = redbiom.get_config()
@@ -40,12 +36,7 @@ def metadata_full(query, categories=False, get=None):
     else:
         target = 'text-search'
 
-    stemmer = nltk.PorterStemmer(nltk.PorterStemmer.MARTIN_EXTENSIONS)
-    nltk_data_path = join(dirname(__file__), 'assets', 'nltk_data')
-    if nltk.data.path[0] != nltk_data_path:
-        nltk.data.path = [nltk_data_path] + nltk.data.path
-    stops = frozenset(nltk.corpus.stopwords.words('english'))
-    stem_f = functools.partial(redbiom.util.stems, stops, stemmer)
+    stem_f = _stemmer()
 
     samples = set()
     for plan_type, q in query_plan(query):
@@ -66,6 +57,59 @@ def metadata_full(query, categories=False, get=None):
     return samples
 
 
+def metadata_full_count(query, categories=False, get=None):
+    """Count the samples or categories matching a query
+
+    Parameters
+    ----------
+    query : str
+        The query to execute
+    categories : boolean, optional
+        Whether to search for categories (True) or samples (False, default).
+    get : function
+        A getter
+
+    Notes
+    -----
+    Queries composed only of set operations are counted server-side, so the
+    matching IDs are not transferred. Queries with a where clause require the
+    category values and are evaluated with metadata_full.
+
+    Returns
+    -------
+    int
+        The number of observed sample IDs or categories
+    """
+    import redbiom.set_expr
+
+    plan = query_plan(query)
+    if [plan_type for plan_type, _ in plan] != ['set']:
+        return len(metadata_full(query, categories, get))
+
+    if categories:
+        target = 'category-search'
+    else:
+        target = 'text-search'
+
+    return redbiom.set_expr.setcount(plan[0][1], stemmer=_stemmer(),
+                                     target=target)
+
+
+def _stemmer():
+    """Construct the stemming function used for search"""
+    from os.path import join, dirname
+    import redbiom.util
+    import functools
+    import nltk
+
+    stemmer = nltk.PorterStemmer(nltk.PorterStemmer.MARTIN_EXTENSIONS)
+    nltk_data_path = join(dirname(__file__), 'assets', 'nltk_data')
+    if nltk.data.path[0] != nltk_data_path:
+        nltk.data.path = [nltk_data_path] + nltk.data.path
+    stops = frozenset(nltk.corpus.stopwords.words('english'))
+    return functools.partial(redbiom.util.stems, stops, stemmer)
+
+
 def query_plan(query):
     """Light sanity checking and query partitioning
 
@@ -99,3 +99,97 @@ def seteval(str_, get=None, stemmer=None, target=None):
     del target
 
     return result
+
+
+_postfix_ops = {ast.BitAnd: 'and',
+                ast.BitOr: 'or',
+                ast.BitXor: 'xor',
+                ast.Sub: 'sub'}
+
+
+def to_postfix(str_, stemmer=None):
+    """Compile a set operation string into a postfix program
+
+    Parameters
+    ----------
+    str_ : str
+        The query to compile
+    stemmer : function, optional
+        A method to stem a query Name. If None, defaults to passthrough.
+
+    Raises
+    ------
+    TypeError
+        If an unsupported operation is used.
+    ValueError
+        If a Name does not yield a usable stem.
+
+    Returns
+    -------
+    list of str
+        The program, where operands are of the form "k:<stem>" and operators
+        are of the form "o:<and|or|xor|sub>". The program is suitable for the
+        count-set-expr script.
+    """
+    if stemmer is None:
+        stemmer = passthrough
+
+    formed = ast.parse(str_, mode='eval')
+
+    program = []
+
+    def walk(node):
+        if isinstance(node, ast.Expression):
+            walk(node.body)
+        elif isinstance(node, ast.BinOp) and type(node.op) in _postfix_ops:
+            walk(node.left)
+            walk(node.right)
+            program.append('o:%s' % _postfix_ops[type(node.op)])
+        elif isinstance(node, ast.Name):
+            try:
+                stem = next(stemmer(node.id))
+            except StopIteration:
+                raise ValueError("No usable search stem found for: %s" %
+                                 node.id)
+            program.append('k:%s' % stem)
+        else:
+            raise TypeError("Unsupported node type: %s" % ast.dump(node))
+
+    walk(formed)
+    return program
+
+
+def setcount(str_, stemmer=None, target=None):
+    """Compute the cardinality of a set operation string server-side
+
+    Parameters
+    ----------
+    str_ : str
+        The query to evaluate
+    stemmer : function, optional
+        A method to stem a query Name. If None, defaults to passthrough.
+    target : str, optional
+        A subcontext to query against. If None, defaults to text-search.
+
+    Returns
+    -------
+    int
+        The number of members in the resulting set.
+
+    Redis command summary
+    ---------------------
+    EVALSHA <count-set-expr-sha1> 0 metadata:<target> <program> ...
+    """
+    import redbiom
+    import redbiom._requests
+    import redbiom.admin
+
+    if target is None:
+        target = 'text-search'
+
+    program = to_postfix(str_, stemmer)
+
+    config = redbiom.get_config()
+    se = redbiom._requests.make_script_exec(config)
+    counter = redbiom.admin.ScriptManager.get('count-set-expr')
+    return int(se(counter, 0, 'metadata:%s' % target, *program))
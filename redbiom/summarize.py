@@ -6,6 +6,13 @@ def contexts(detail=True):
     detail : bool, optional
         If True, obtain additional context detail.
 
+    Notes
+    -----
+    The detail for all contexts is obtained in a single request. If a cache
+    directory and an HTTP cache size are configured, the detail is cached on
+    disk for the generation of the database, which creating a context and
+    loading or deleting sample data increment, see make_get.
+
     Returns
     -------
     DataFrame
@@ -14,13 +21,14 @@ def contexts(detail=True):
     Redis command summary
     ---------------------
     HGETALL state:contexts
-    SCARD <context>:samples-represented
-    SCARD <context>:features-represented
+    EVALSHA <context-stats-sha1> 0
     """
     import pandas as pd
     import redbiom
     import redbiom._requests
-    get = redbiom._requests.make_get(redbiom.get_config())
+    import redbiom.admin
+    config = redbiom.get_config()
+    get = redbiom._requests.make_get(config)
 
     if not detail:
         contexts = get('state', 'HKEYS', 'contexts')
@@ -28,12 +36,14 @@ def contexts(detail=True):
     else:
         contexts = get('state', 'HGETALL', 'contexts')
 
-        result = []
-        for name, desc in contexts.items():
-            ctx_n_samp = get(name, 'SCARD', 'samples-represented')
-            ctx_n_feat = get(name, 'SCARD', 'features-represented')
+        if not contexts:
+            result = []
+        else:
+            se = redbiom._requests.make_script_exec(config, cache=True)
+            stats = se(redbiom.admin.ScriptManager.get('context-stats'), 0)
 
-            result.append((name, int(ctx_n_samp), int(ctx_n_feat), desc))
+            result = [(name, int(n_samp), int(n_feat), desc)
+                      for name, n_samp, n_feat, desc in stats]
 
         return pd.DataFrame(result, columns=['ContextName', 'SamplesWithData',
                                              'FeaturesWithData',
@@ -89,3 +99,261 @@ def category_from_samples(category, samples):
     """
     import redbiom.fetch
     return redbiom.fetch.category_sample_values(category, samples)
+
+
+def category_codes(context, category, get=None):
+    """Integer-code a category over the sample index of a context
+
+    Parameters
+    ----------
+    context : str
+        The context whose sample index to code.
+    category : str
+        The metadata category to code.
+    get : function, optional
+        A get method.
+
+    Returns
+    -------
+    np.ndarray of str
+        The unique category values, in code order.
+    np.ndarray of int
+        The code of each sample index within the context, -1 if the sample
+        does not have a value for the category.
+
+    Redis command summary
+    ---------------------
+    HGETALL metadata:category:<category>
+    HGETALL <context>:sample-index-inverted
+    """
+    import numpy as np
+    import redbiom
+    import redbiom._requests
+
+    if get is None:
+        get = redbiom._requests.make_get(redbiom.get_config())
+
+    md = get('metadata', 'HGETALL', 'category:%s' % category)
+    values = np.array(sorted(set(md.values())), dtype=object)
+    value_codes = {v: i for i, v in enumerate(values)}
+
+    inverted = get(context, 'HGETALL', 'sample-index-inverted')
+    size = max([int(i) for i in inverted] or [-1]) + 1
+    codes = np.full(size, -1, dtype=np.int64)
+
+    for idx, rbid in inverted.items():
+        # metadata are keyed without the tag of the sample data
+        value = md.get(rbid.split('_', 1)[-1])
+        if value is not None:
+            codes[int(idx)] = value_codes[value]
+
+    return values, codes
+
+
+def feature_category_counts(context, features, values, codes,
+                            buffer_size=100):
+    """Count the samples per category value for each feature
+
+    Parameters
+    ----------
+    context : str
+        The context to operate in.
+    features : Iterable of str
+        The features to summarize.
+    values : np.ndarray of str
+        The unique category values as obtained from category_codes.
+    codes : np.ndarray of int
+        The sample index codes as obtained from category_codes.
+    buffer_size : int, optional
+        The number of features to fetch per request.
+
+    Returns
+    -------
+    np.ndarray of int
+        A features x values matrix of sample counts, in the order of
+        features.
+
+    Redis command summary
+    ---------------------
+    EVALSHA <fetch-indices-sha1> 0 <context> feature <id> ... <id>
+    """
+    import numpy as np
+    import redbiom
+    import redbiom._requests
+    import redbiom.admin
+
+    se = redbiom._requests.make_script_exec(redbiom.get_config())
+    fetcher = redbiom.admin.ScriptManager.get('fetch-indices')
+
+    features = list(features)
+    counts = np.zeros((len(features), len(values)), dtype=np.int64)
+    for start in range(0, len(features), buffer_size):
+        block = features[start:start + buffer_size]
+        indices = se(fetcher, 0, context, 'feature', *block)
+        for row, feature in enumerate(block, start):
+            # a sample is counted once even if listed more than once
+            sample_indices = np.asarray(list(indices.get(feature, [])),
+                                        dtype=np.int64)
+            feature_codes = codes[np.unique(sample_indices)]
+            feature_codes = feature_codes[feature_codes >= 0]
+            counts[row] = np.bincount(feature_codes, minlength=len(values))
+
+    return counts
+
+
+def taxonomy(lineages):
+    """Count the features represented by each taxon
+
+    Parameters
+    ----------
+    lineages : list of list of str
+        The lineage of each feature, such as from fetch.taxon_ancestors.
+
+    Notes
+    -----
+    The lineages are represented as a matrix of integer-coded ranks, and
+    each taxon is counted by grouping on the ranks leading to it. A taxon is
+    identified by its full path, so a name observed under different parents
+    is counted separately. Unclassified taxa (e.g., "g__") are omitted,
+    although the taxa beneath them are not.
+
+    Returns
+    -------
+    pandas.DataFrame
+        With columns Taxon, Count and FractionOfInput, in postorder such that
+        a taxon follows all of the taxa it contains.
+    """
+    import numpy as np
+    import pandas as pd
+
+    columns = ['Taxon', 'Count', 'FractionOfInput']
+    if not lineages:
+        return pd.DataFrame([], columns=columns)
+
+    ranks = pd.DataFrame(list(lineages), dtype=object)
+    codes = np.empty(ranks.shape, dtype=np.int64)
+    names = []
+    for i in ranks.columns:
+        # -1 denotes a lineage which does not extend to this rank
+        codes[:, i], uniques = pd.factorize(ranks[i])
+        names.append(uniques)
+    codes = pd.DataFrame(codes)
+
+    found = []
+    for depth in range(codes.shape[1]):
+        prefix = list(range(depth + 1))
+        observed = codes[codes[depth] >= 0]
+        sizes = observed.groupby(prefix).size()
+        for path, count in zip(sizes.index, sizes.values):
+            if depth == 0:
+                path = (path, )
+            path = tuple(names[d][c] for d, c in enumerate(path))
+            found.append((path, count))
+
+    # a taxon is emitted after its descendents, and siblings are ordered by
+    # name
+    found.sort(key=lambda item: tuple((0, n) for n in item[0]) + ((1, ''), ))
+
+    n_tips = float(len(ranks))
+    result = [(path[-1], count, count / n_tips) for path, count in found
+              if not path[-1].endswith('__')]
+    return pd.DataFrame(result, columns=columns)
+
+
+_table_worker_state = {}
+
+
+def _init_table_worker(context, values, codes):
+    """Share the category coding with a worker process"""
+    _table_worker_state['context'] = context
+    _table_worker_state['values'] = values
+    _table_worker_state['codes'] = codes
+
+
+def _table_worker(features):
+    """Summarize a block of features within a worker process"""
+    return feature_category_counts(_table_worker_state['context'], features,
+                                   _table_worker_state['values'],
+                                   _table_worker_state['codes'])
+
+
+def table(context, category, features, get=None, jobs=1, chunk_size=1000,
+          progress=None):
+    """Summarize features over a metadata category
+
+    Parameters
+    ----------
+    context : str
+        The context to operate in.
+    category : str
+        The metadata category to summarize.
+    features : Iterable of str
+        The features to summarize.
+    get : function, optional
+        A get method.
+    jobs : int, optional
+        The number of worker processes to use.
+    chunk_size : int, optional
+        The number of features handed to a worker at a time.
+    progress : function, optional
+        Called with the number of features completed as each chunk finishes.
+
+    Notes
+    -----
+    The category and the sample index of the context are fetched once, and
+    the samples of each feature are fetched in bulk as unresolved indices.
+    When using multiple jobs, the category coding is handed to each worker
+    when it starts rather than refetched per feature.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A DataFrame indexed by feature, with a column per category value,
+        valued by the number of samples containing the feature.
+    """
+    import numpy as np
+    import pandas as pd
+    import redbiom
+    import redbiom._requests
+
+    if get is None:
+        get = redbiom._requests.make_get(redbiom.get_config())
+
+    redbiom._requests.valid(context, get)
+
+    features = list(features)
+    values, codes = category_codes(context, category, get)
+
+    chunks = [features[i:i + chunk_size]
+              for i in range(0, len(features), chunk_size)]
+
+    if jobs > 1 and len(chunks) > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs, initializer=_init_table_worker,
+                                    initargs=(context, values, codes))
+        try:
+            results = []
+            for chunk, counts in zip(chunks, pool.imap(_table_worker,
+                                                       chunks)):
+                results.append(counts)
+                if progress is not None:
+                    progress(len(chunk))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = []
+        for chunk in chunks:
+            results.append(feature_category_counts(context, chunk, values,
+                                                   codes))
+            if progress is not None:
+                progress(len(chunk))
+
+    if results:
+        counts = np.vstack(results)
+    else:
+        counts = np.zeros((0, len(values)), dtype=np.int64)
+
+    df = pd.DataFrame(counts, index=features, columns=values)
+    df.index.name = 'feature'
+    return df
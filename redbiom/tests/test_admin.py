@@ -1,7 +1,14 @@
+import io
+import os
+import sys
+import shutil
+import tempfile
 import unittest
 import hashlib
 
 import skbio
+import numpy as np
+import scipy.sparse
 import pandas as pd
 import biom
 import requests
@@ -10,6 +17,8 @@ import redbiom
 import redbiom.admin
 import redbiom._requests
 import redbiom.fetch
+import redbiom.search
+import redbiom.util
 from redbiom.tests import assert_test_env
 
 assert_test_env()
@@ -85,6 +94,24 @@ class AdminTests(unittest.TestCase):
         obs = redbiom.admin._metadata_to_taxonomy_tree(*input)
         self.assertEqual(obs.compare_subsets(exp), 0.0)
 
+    def test_pack_vectors(self):
+        matrix = scipy.sparse.csc_matrix(np.array([[1, 0, 0],
+                                                   [0, 0, 12.7],
+                                                   [250, 0, 3]]))
+        lookup = np.array([9, 10, 1234])
+        exp = ['1/9/250/1234', '', '12/10/3/1234']
+        obs = redbiom.admin._pack_vectors(matrix, lookup)
+        self.assertEqual(obs, exp)
+
+        exp = ['1/5', '12/7', '250/5/3/7']
+        obs = redbiom.admin._pack_vectors(matrix.tocsr(),
+                                          np.array([5, 6, 7]))
+        self.assertEqual(obs, exp)
+
+        obs = redbiom.admin._pack_vectors(scipy.sparse.csc_matrix((2, 2)),
+                                          lookup)
+        self.assertEqual(obs, ['', ''])
+
     def test_get_index(self):
         context = 'load-features-test'
         redbiom.admin.create_context(context, 'foo')
@@ -95,6 +122,18 @@ class AdminTests(unittest.TestCase):
             obs = redbiom.admin.get_index(context, key, 'feature')
             self.assertEqual(obs, exp)
 
+    def test_get_indices(self):
+        context = 'load-features-test'
+        redbiom.admin.create_context(context, 'foo')
+
+        redbiom.admin.get_index(context, 'B', 'feature')
+        obs = redbiom.admin.get_indices(context, ['A', 'B', 'C', 'A', 'Z'],
+                                        'feature', buffer_size=2)
+        self.assertEqual(obs, {'B': 0, 'A': 1, 'C': 2, 'Z': 3})
+        self.assertEqual(redbiom.admin.get_index(context, 'Z', 'feature'), 3)
+        obs = self.get(context, 'HGETALL', 'feature-index-inverted')
+        self.assertEqual(obs, {'0': 'B', '1': 'A', '2': 'C', '3': 'Z'})
+
     def test_create_context(self):
         obs = self.get('state', 'HGETALL', 'contexts')
         self.assertNotIn('another test', list(obs.keys()))
@@ -224,6 +263,266 @@ class AdminTests(unittest.TestCase):
             obs = self.get(context, 'HGET', 'taxonomy-parents/%s' % name)
             self.assertEqual(obs, exp)
 
+    def test_load_sample_data_taxon_tips(self):
+        context = 'load-sample-data'
+        redbiom.admin.create_context(context, 'foo')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.load_sample_metadata(metadata_with_alt)
+        redbiom.admin.load_sample_data(table, context, tag=None)
+        redbiom.admin.load_sample_data(table_with_alt, context, tag=None)
+        self.assertEqual(self.get(context, 'HGET', 'state/taxon-tips'), '1')
+
+        index = self.get(context, 'HGETALL', 'feature-index')
+        for taxon in ('f__Actinomycetaceae', 'p__Firmicutes'):
+            exp = {index[i] for i, md in
+                   zip(table.ids(axis='observation'),
+                       table.metadata(axis='observation'))
+                   if taxon in md['taxonomy']}
+            obs = set(self.get(context, 'SMEMBERS', 'taxon-tips:%s' % taxon))
+            self.assertTrue(exp)
+            self.assertTrue(exp.issubset(obs))
+
+    def test_load_sample_data_taxon_tips_legacy(self):
+        context = 'load-sample-data'
+        redbiom.admin.create_context(context, 'foo')
+        redbiom.admin.load_sample_metadata(metadata)
+
+        # a context holding taxonomy without the tip index is not indexed
+        post = redbiom._requests.make_post(redbiom.get_config())
+        post(context, 'HSET', 'state/has-taxonomy/1')
+        redbiom.admin.load_sample_data(table, context, tag=None)
+        self.assertEqual(self.get(context, 'HGET', 'state/taxon-tips'), None)
+        self.assertEqual(self.get(context, 'EXISTS',
+                                  'taxon-tips:p__Firmicutes'), 0)
+
+    def test_load_sample_data_mass_insertion(self):
+        context = 'load-sample-data'
+        redbiom.admin.create_context(context, 'foo')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.load_sample_metadata(metadata_with_alt)
+        redbiom.admin.load_sample_data(table, context, tag=None)
+        redbiom.admin._snapshots.clear()
+
+        class Stdout(object):
+            buffer = io.BytesIO()
+
+        stdout = sys.stdout
+        sys.stdout = Stdout()
+        try:
+            redbiom.admin.load_sample_data(table_with_alt, context, tag=None,
+                                           redis_protocol=True)
+        finally:
+            sys.stdout = stdout
+            redbiom.admin._snapshots.clear()
+
+        _apply_resp(Stdout.buffer.getvalue())
+
+        exp = {'UNTAGGED_%s' % i for i in table_with_alt.ids()}
+        obs = set(self.get(context, 'SMEMBERS', 'samples-represented'))
+        self.assertTrue(exp.issubset(obs))
+
+        # the indices assigned locally continue from those held in redis
+        index = self.get(context, 'HGETALL', 'feature-index')
+        inverted = self.get(context, 'HGETALL', 'feature-index-inverted')
+        self.assertEqual(int(index.pop('current_id')), len(index))
+        self.assertEqual({v: k for k, v in index.items()}, inverted)
+
+        # only the samples novel to the context were loaded
+        novel = set(table_with_alt.ids()) - set(table.ids())
+        obs, _ = redbiom.fetch.data_from_samples(context, novel)
+        for sample in novel:
+            exp = table_with_alt.data(sample)
+            exp_ids = table_with_alt.ids(axis='observation')[exp > 0]
+            obs_sample = obs.data('%s.UNTAGGED' % sample)
+            obs_ids = obs.ids(axis='observation')[obs_sample > 0]
+            self.assertEqual(set(obs_ids), set(exp_ids))
+            self.assertEqual(sorted(obs_sample[obs_sample > 0]),
+                             sorted(exp[exp > 0]))
+
+    def test_compact_features(self):
+        context = 'load-sample-data'
+        redbiom.admin.create_context(context, 'foo')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.load_sample_data(table, context, tag=None)
+
+        feature = table.ids(axis='observation')[0]
+        key = 'feature:%s' % feature
+        items = self.get(context, 'LRANGE', '%s/0/-1' % key)
+        exp = sorted(zip(items[::2], items[1::2]), key=lambda p: int(p[0]))
+        exp = [v for pair in exp for v in pair]
+
+        # a repeated sample, and a sample which is not represented
+        redbiom._requests.make_post(redbiom.get_config())(
+            context, 'LPUSH', '%s/3/123456/%s/%s' % (key, items[1], items[0]))
+
+        n_modified = len(self.get(context, 'SMEMBERS', 'features-modified'))
+        self.assertEqual(redbiom.admin.compact_features(context),
+                         (n_modified, 2))
+        self.assertEqual(self.get(context, 'LRANGE', '%s/0/-1' % key), exp)
+        self.assertEqual(self.get(context, 'SCARD', 'features-modified'), 0)
+
+        # only the features loaded since are revisited
+        self.assertEqual(redbiom.admin.compact_features(context), (0, 0))
+        obs = redbiom.admin.compact_features(context, full=True)
+        self.assertEqual(obs, (n_modified, 0))
+
+        obs = redbiom.util.ids_from([feature], True, 'feature', [context])
+        exp = {'UNTAGGED_%s' % i for i in table.ids()
+               if table.get_value_by_ids(feature, i) > 0}
+        self.assertEqual(obs, exp)
+
+    def test_delete_tag(self):
+        redbiom.admin.create_context('a', 'foo')
+        redbiom.admin.create_context('b', 'foo')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.load_sample_metadata_full_search(metadata)
+        for tag in ('1', '2'):
+            redbiom.admin.load_sample_metadata(metadata, tag=tag)
+            redbiom.admin.load_sample_metadata_full_search(metadata, tag=tag)
+        redbiom.admin.load_sample_data(table, 'a', tag='1')
+        redbiom.admin.load_sample_data(table, 'a', tag='2')
+        redbiom.admin.load_sample_data(table, 'b', tag='1')
+
+        self.assertEqual(redbiom.admin.delete_tag('a', '2'), len(table.ids()))
+
+        exp = {'1_%s' % i for i in table.ids()}
+        obs = set(self.get('a', 'SMEMBERS', 'samples-represented'))
+        self.assertEqual(obs, exp)
+        for id_ in table.ids():
+            self.assertEqual(self.get('a', 'EXISTS', 'sample:2_%s' % id_), 0)
+
+        # the entries of the tag are stripped from each feature
+        for feature in table.ids(axis='observation'):
+            exp = {'1_%s' % i for i in table.ids()
+                   if table.get_value_by_ids(feature, i) > 0}
+            obs = redbiom.util.ids_from([feature], True, 'feature', ['a'])
+            self.assertEqual(obs, exp)
+
+        # the metadata of the tag are deleted as no context represents it
+        obs = set(self.get('metadata', 'SMEMBERS', 'samples-represented'))
+        self.assertFalse({'2_%s' % i for i in table.ids()} & obs)
+        self.assertTrue({'1_%s' % i for i in table.ids()}.issubset(obs))
+        self.assertTrue(set(table.ids()).issubset(obs))
+        for id_ in table.ids():
+            self.assertEqual(self.get('metadata', 'EXISTS',
+                                      'categories:2_%s' % id_), 0)
+
+        obs = redbiom.search.metadata_full('feces')
+        self.assertFalse({'2_%s' % i for i in table.ids()} & obs)
+        self.assertTrue({'1_%s' % i for i in table.ids()} & obs)
+
+    def test_delete_studies_by_id(self):
+        redbiom.admin.create_context('a', 'foo')
+        redbiom.admin.create_context('b', 'foo')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.load_sample_metadata_full_search(metadata)
+        redbiom.admin.load_sample_data(table, 'a', tag=None)
+        redbiom.admin.load_sample_data(table, 'b', tag=None)
+
+        # the samples remain represented in b
+        self.assertEqual(redbiom.admin.delete_studies_by_id('a', ['10317']),
+                         len(table.ids()))
+        self.assertEqual(self.get('a', 'SCARD', 'samples-represented'), 0)
+        self.assertEqual(self.get('a', 'SCARD', 'features-represented'), 0)
+        obs = set(self.get('metadata', 'SMEMBERS', 'samples-represented'))
+        self.assertEqual(obs, set(table.ids()))
+
+        self.assertEqual(redbiom.admin.delete_studies_by_id('b', ['10317']),
+                         len(table.ids()))
+        self.assertEqual(self.get('metadata', 'SCARD', 'samples-represented'),
+                         0)
+        self.assertEqual(redbiom.search.metadata_full('feces'), set())
+        for id_ in table.ids():
+            self.assertEqual(self.get('metadata', 'EXISTS',
+                                      'categories:%s' % id_), 0)
+
+    def test_load_sample_data_parallel(self):
+        context = 'load-sample-data'
+        redbiom.admin.create_context(context, 'foo')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.load_sample_metadata(metadata_with_alt)
+
+        # test_with_alts.biom shares samples with test.biom
+        tables = [(context, None, 'test.biom'),
+                  (context, None, 'test_with_alts.biom'),
+                  (context, 'foo', 'test.biom'),
+                  (context, None, 'does-not-exist.biom'),
+                  ('does-not-exist', None, 'test.biom')]
+        obs = redbiom.admin.load_sample_data_parallel(tables, jobs=2)
+        obs = {task: (n_loaded, error) for task, n_loaded, error in obs}
+
+        novel = set(table_with_alt.ids()) - set(table.ids())
+        self.assertEqual(obs[tables[0]], (len(table.ids()), None))
+        self.assertEqual(obs[tables[1]], (len(novel), None))
+        self.assertEqual(obs[tables[2]], (len(table.ids()), None))
+        self.assertEqual(obs[tables[3]][0], 0)
+        self.assertIn('does-not-exist.biom', obs[tables[3]][1])
+        self.assertEqual(obs[tables[4]],
+                         (0, 'ValueError: Unknown context: does-not-exist'))
+
+        exp = {'UNTAGGED_%s' % i for i in table.ids()}
+        exp.update({'UNTAGGED_%s' % i for i in novel})
+        exp.update({'foo_%s' % i for i in table.ids()})
+        obs = set(self.get(context, 'SMEMBERS', 'samples-represented'))
+        self.assertEqual(obs, exp)
+
+        index = self.get(context, 'HGETALL', 'feature-index')
+        inverted = self.get(context, 'HGETALL', 'feature-index-inverted')
+        self.assertEqual(int(index.pop('current_id')), len(index))
+        self.assertEqual({v: k for k, v in index.items()}, inverted)
+
+        # each sample was loaded once
+        for id_ in table.ids():
+            exp = table.data(id_)
+            values = self.get(context, 'LRANGE',
+                              'sample:UNTAGGED_%s/0/-1' % id_)
+            self.assertEqual(len(values), 2 * (exp > 0).sum())
+
+    def test_build_dump(self):
+        directory = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(directory, 'metadata'))
+            os.mkdir(os.path.join(directory, 'test'))
+            shutil.copy('test.txt', os.path.join(directory, 'metadata'))
+            shutil.copy('test.biom', os.path.join(directory, 'test',
+                                                  '1.biom'))
+            shutil.copy('test_with_alts.biom', os.path.join(directory,
+                                                            'test', '2.biom'))
+            with open(os.path.join(directory, 'test', 'description.txt'),
+                      'w') as fp:
+                fp.write('foo\n')
+
+            output = io.BytesIO()
+            obs = redbiom.admin.build_dump(directory, output, jobs=2)
+        finally:
+            shutil.rmtree(directory)
+
+        # the samples of test_with_alts.biom lack metadata
+        self.assertEqual(obs['samples'], len(metadata))
+        self.assertEqual(obs['tables'], 1)
+        self.assertEqual(len(obs['skipped']), 1)
+
+        _apply_resp(output.getvalue())
+        redbiom.admin.ScriptManager.load_scripts()
+
+        self.assertEqual(self.get('state', 'HGETALL', 'contexts'),
+                         {'test': 'foo'})
+        exp = {'1_%s' % i for i in table.ids()}
+        obs = set(self.get('test', 'SMEMBERS', 'samples-represented'))
+        self.assertEqual(obs, exp)
+        obs = set(self.get('metadata', 'SMEMBERS', 'samples-represented'))
+        self.assertEqual(obs, set(metadata['#SampleID']))
+
+        obs, _ = redbiom.fetch.data_from_samples('test', table.ids())
+        for sample in table.ids():
+            exp = table.data(sample)
+            exp_ids = table.ids(axis='observation')[exp > 0]
+            obs_sample = obs.data('%s.1' % sample)
+            obs_ids = obs.ids(axis='observation')[obs_sample > 0]
+            self.assertEqual(set(obs_ids), set(exp_ids))
+            self.assertEqual(sorted(obs_sample[obs_sample > 0]),
+                             sorted(exp[exp > 0]))
+
     def test_load_sample_metadata(self):
         redbiom.admin.load_sample_metadata(metadata)
         exp = set(metadata.columns) - set(['#SampleID'])
@@ -233,6 +532,25 @@ class AdminTests(unittest.TestCase):
         obs = set(self.get('metadata', 'SMEMBERS', 'samples-represented'))
         self.assertEqual(obs, exp)
 
+    def test_load_sample_metadata_category_counts(self):
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.load_sample_metadata(metadata_with_alt)
+        obs = self.get('metadata', 'HGETALL', 'category-counts')
+        for category in ('LATITUDE', 'SIMPLE_BODY_SITE', 'AGE_CAT'):
+            exp = self.get('metadata', 'HLEN', 'category:%s' % category)
+            self.assertEqual(int(obs[category]), exp)
+
+    def test_load_sample_metadata_category_counts_seeded(self):
+        # categories loaded before the counts were tracked lack a count
+        redbiom.admin.load_sample_metadata(metadata)
+        post = redbiom._requests.make_post(redbiom.get_config())
+        post('metadata', 'HDEL', 'category-counts/LATITUDE')
+
+        redbiom.admin.load_sample_metadata(metadata_with_alt)
+        obs = self.get('metadata', 'HGET', 'category-counts/LATITUDE')
+        exp = self.get('metadata', 'HLEN', 'category:LATITUDE')
+        self.assertEqual(int(obs), exp)
+
     def test_load_sample_metadata_full_search(self):
         redbiom.admin.load_sample_metadata(metadata)
         redbiom.admin.load_sample_metadata_full_search(metadata)
@@ -288,5 +606,19 @@ class AdminTests(unittest.TestCase):
             self.assertEqual(obs, exp)
 
 
+def _apply_resp(data):
+    """Apply commands in the native protocol as redis-cli --pipe would"""
+    post = redbiom._requests.make_post(redbiom.get_config())
+    resp = data.decode('utf-8').split('\r\n')
+    while len(resp) > 1:
+        nargs = int(resp[0][1:])
+        args = resp[2:2 * nargs + 1:2]
+        resp = resp[2 * nargs + 1:]
+
+        # scripts are not expressible over HTTP
+        if args[0] != 'SCRIPT':
+            post(None, args[0], '/'.join(args[1:]))
+
+
 if __name__ == '__main__':
     unittest.main()
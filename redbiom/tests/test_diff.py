@@ -0,0 +1,146 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import biom
+
+from redbiom.nightly.diff import (sample_hashes, artifact_state,
+                                  load_state_file, write_state_file,
+                                  read_journal, append_journal, diff)
+
+
+def make_table(data, features, samples):
+    return biom.Table(np.array(data), features, samples)
+
+
+class DiffTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_table(self, table, name):
+        path = os.path.join(self.dir, name)
+        with biom.util.biom_open(path, 'w') as fp:
+            table.to_hdf5(fp, 'test')
+        return path
+
+    def test_sample_hashes(self):
+        t1 = make_table([[0, 1, 2], [3, 0, 4]], ['O1', 'O2'],
+                        ['S1', 'S2', 'S3'])
+        # the same samples, with the features reordered and another sample
+        t2 = make_table([[3, 0, 4, 1], [0, 1, 2, 0]], ['O2', 'O1'],
+                        ['S1', 'S2', 'S3', 'S4'])
+        t3 = make_table([[0, 1, 2], [3, 0, 5]], ['O1', 'O2'],
+                        ['S1', 'S2', 'S3'])
+
+        h1 = sample_hashes(t1)
+        h2 = sample_hashes(t2)
+        h3 = sample_hashes(t3)
+
+        self.assertEqual(set(h1), {'S1', 'S2', 'S3'})
+        self.assertEqual(len(set(h1.values())), 3)
+        for id_ in h1:
+            self.assertEqual(h1[id_], h2[id_])
+        self.assertEqual(h1['S1'], h3['S1'])
+        self.assertEqual(h1['S2'], h3['S2'])
+        self.assertNotEqual(h1['S3'], h3['S3'])
+
+    def test_artifact_state(self):
+        t1 = make_table([[0, 1], [3, 0]], ['O1', 'O2'], ['S1', 'S2'])
+        path = self.write_table(t1, 'a.biom')
+
+        obs = artifact_state(1, '10', 'ctx', path)
+        self.assertEqual(obs['study'], 1)
+        self.assertEqual(obs['tag'], '10')
+        self.assertEqual(obs['context'], 'ctx')
+        self.assertEqual(obs['path'], path)
+        self.assertEqual(obs['samples'], sample_hashes(t1))
+
+        # an unchanged file reuses the prior hashes
+        previous = dict(obs, samples={'S1': 'foo'})
+        obs = artifact_state(1, '10', 'ctx', path, previous)
+        self.assertEqual(obs['samples'], {'S1': 'foo'})
+
+        # a missing file retains the prior record
+        missing = os.path.join(self.dir, 'missing.biom')
+        self.assertIs(artifact_state(1, '10', 'ctx', missing, previous),
+                      previous)
+        self.assertIsNone(artifact_state(1, '10', 'ctx', missing))
+
+    def test_state_file(self):
+        path = os.path.join(self.dir, 'state.jsonl')
+        self.assertEqual(load_state_file(path), {})
+
+        state = {('ctx', '10'): {'study': 1, 'tag': '10', 'context': 'ctx',
+                                 'path': 'a.biom', 'hash': 'abc',
+                                 'samples': {'S1': 'x', 'S2': 'y'}},
+                 ('ctx', '11'): {'study': 2, 'tag': '11', 'context': 'ctx',
+                                 'path': 'b.biom', 'hash': 'def',
+                                 'samples': {}}}
+        write_state_file(path, state)
+        self.assertEqual(load_state_file(path), state)
+        self.assertFalse(os.path.exists(path + '.tmp'))
+
+    def test_journal(self):
+        path = os.path.join(self.dir, 'state.jsonl.journal')
+        self.assertEqual(read_journal(path), {})
+
+        r1 = {'study': 1, 'tag': '10', 'context': 'ctx', 'path': 'a.biom',
+              'hash': 'abc', 'samples': {'S1': 'x'}}
+        r2 = dict(r1, hash='def')
+        append_journal(path, 'deleted', r1)
+        append_journal(path, 'loaded', r1)
+        append_journal(path, 'deleted', r2)
+
+        # an interrupted write is ignored
+        with open(path, 'a') as fp:
+            fp.write('{"step": "loaded", "rec')
+
+        exp = {('ctx', '10', 'deleted'): r2,
+               ('ctx', '10', 'loaded'): r1}
+        self.assertEqual(read_journal(path), exp)
+
+        # an entry following an interrupted write is retained
+        r3 = dict(r1, tag='11')
+        append_journal(path, 'loaded', r3)
+        exp[('ctx', '11', 'loaded')] = r3
+        self.assertEqual(read_journal(path), exp)
+
+    def test_diff(self):
+        def record(tag, digest, samples):
+            return {'study': 1, 'tag': tag, 'context': 'ctx', 'path': '',
+                    'hash': digest, 'samples': samples}
+
+        old = {('ctx', 'same'): record('same', 'a', {'S1': 'x'}),
+               ('ctx', 'changed'): record('changed', 'b', {'S1': 'x',
+                                                           'S2': 'y',
+                                                           'S3': 'z'}),
+               ('ctx', 'removed'): record('removed', 'c', {'S1': 'x'})}
+        new = {('ctx', 'same'): record('same', 'a', {'S1': 'x'}),
+               ('ctx', 'changed'): record('changed', 'd', {'S1': 'x',
+                                                           'S2': 'w',
+                                                           'S4': 'v'}),
+               ('ctx', 'added'): record('added', 'e', {'S1': 'x'})}
+
+        exp = {('ctx', 'changed'): ({'S2', 'S3'}, {'S2', 'S4'}),
+               ('ctx', 'removed'): ({'S1'}, set()),
+               ('ctx', 'added'): (set(), {'S1'})}
+        self.assertEqual(diff(old, new), exp)
+        self.assertEqual(diff(new, new), {})
+        self.assertEqual(diff({}, {}), {})
+
+    def test_diff_unchanged_samples(self):
+        # a rewritten file with identical samples requires no work
+        old = {('ctx', '10'): {'study': 1, 'tag': '10', 'context': 'ctx',
+                               'path': '', 'hash': 'a',
+                               'samples': {'S1': 'x'}}}
+        new = {('ctx', '10'): dict(old[('ctx', '10')], hash='b')}
+        self.assertEqual(diff(old, new), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
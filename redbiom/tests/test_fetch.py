@@ -6,6 +6,8 @@ import biom
 import pandas as pd
 import pandas.util.testing as pdt
 
+import redbiom
+import redbiom._requests
 import redbiom.admin
 import redbiom.fetch
 from redbiom.fetch import (_biom_from_samples, sample_metadata,
@@ -54,6 +56,30 @@ class FetchTests(unittest.TestCase):
         exp = {'tagged_%s' % i for i in table3.ids()}
         self.assertEqual(obs, exp)
 
+    def test_samples_in_context_tag(self):
+        redbiom.admin.create_context('test', 'a nice test')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.load_sample_data(table, 'test', tag=None)
+        redbiom.admin.load_sample_data(table, 'test', tag='tagged')
+
+        obs = samples_in_context('test', unambiguous=True, tag='tagged')
+        exp = {'tagged_%s' % i for i in table.ids()}
+        self.assertEqual(obs, exp)
+
+        obs = samples_in_context('test', unambiguous=False, tag='UNTAGGED')
+        self.assertEqual(obs, set(table.ids()))
+
+        obs = samples_in_context('test', unambiguous=True, tag='missing')
+        self.assertEqual(obs, set())
+
+        # contexts loaded before the tags were indexed are scanned
+        redbiom._requests.make_post(redbiom.get_config())(
+            'test', 'HDEL', 'state/tag-members')
+        redbiom._requests.reset_state()
+        obs = samples_in_context('test', unambiguous=True, tag='tagged')
+        exp = {'tagged_%s' % i for i in table.ids()}
+        self.assertEqual(obs, exp)
+
     def test_features_in_context(self):
         redbiom.admin.create_context('test', 'a nice test')
         redbiom.admin.load_sample_metadata(metadata)
@@ -134,6 +160,53 @@ class FetchTests(unittest.TestCase):
                                             normalize=list('kpcofgs'))
         self.assertEqual(obs, exp)
 
+    def test_taxon_ancestors_cached(self):
+        import os
+        import hashlib
+        import shutil
+        import tempfile
+
+        redbiom.admin.create_context('test', 'a nice test')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.load_sample_data(table, 'test', tag=None)
+        ids = list(table.ids(axis='observation')) + ['o__Bacteroidales']
+        exp = redbiom.fetch.taxon_ancestors('test', ids,
+                                            normalize=list('kpcofgs'))
+
+        cache_dir = tempfile.mkdtemp()
+        os.environ['REDBIOM_CACHE_DIR'] = cache_dir
+        try:
+            obs = redbiom.fetch.taxon_ancestors('test', ids,
+                                                normalize=list('kpcofgs'))
+            self.assertEqual(obs, exp)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            # a second call is served from the local copy
+            obs = redbiom.fetch.taxon_ancestors('test', ids,
+                                                normalize=list('kpcofgs'))
+            self.assertEqual(obs, exp)
+
+            obs = redbiom.fetch.taxon_ancestors('test-missing', ids)
+            self.assertEqual(obs, None)
+
+            # the copy is specific to the host
+            name = hashlib.sha1(('%s\ntest' % redbiom.get_config()[
+                'hostname']).encode('utf-8')).hexdigest()
+            self.assertEqual(os.listdir(cache_dir),
+                             ['taxonomy-parents-%s.json' % name])
+
+            # and is neither used nor written without a taxonomy version
+            os.remove(os.path.join(cache_dir, os.listdir(cache_dir)[0]))
+            post = redbiom._requests.make_post(redbiom.get_config())
+            post('test', 'HDEL', 'state/taxonomy-version')
+            obs = redbiom.fetch.taxon_ancestors('test', ids,
+                                                normalize=list('kpcofgs'))
+            self.assertEqual(obs, exp)
+            self.assertEqual(os.listdir(cache_dir), [])
+        finally:
+            del os.environ['REDBIOM_CACHE_DIR']
+            shutil.rmtree(cache_dir)
+
     def test_taxon_descendents(self):
         redbiom.admin.create_context('test', 'a nice test')
         redbiom.admin.load_sample_metadata(metadata)
@@ -1,13 +1,19 @@
+import os
+import shutil
+import tempfile
 import unittest
 
 import requests
 import biom
 import pandas as pd
 
+import redbiom
 from redbiom import get_config
 import redbiom.admin
 from redbiom._requests import (valid, _parse_validate_request, _format_request,
-                               make_post, make_get, make_put, buffered)
+                               make_post, make_get, make_put, buffered,
+                               make_bulk_post, make_script_exec, state,
+                               context_state, context_flag)
 from redbiom.tests import assert_test_env
 
 assert_test_env()
@@ -31,6 +37,59 @@ class RequestsTests(unittest.TestCase):
         with self.assertRaises(ValueError):
             valid('doesnt exist')
 
+    def test_valid_created_since(self):
+        redbiom.admin.create_context('test', 'foo')
+        self.assertEqual(valid('test'), None)
+
+        # a context created elsewhere is observed without a reset
+        post = make_post(config)
+        post('state', 'HSET', 'contexts/test-2/bar')
+        self.assertEqual(valid('test-2'), None)
+
+    def test_state(self):
+        redbiom.admin.create_context('test', 'foo')
+        obs = state()
+        self.assertEqual(obs['contexts'], {'test': 'foo'})
+        self.assertEqual(obs['scripts']['fetch-sample'],
+                         redbiom.admin.ScriptManager.get('fetch-sample'))
+
+        obs = context_state('test')
+        self.assertEqual(obs['db-version'], redbiom.__db_version__)
+
+    def test_context_flag(self):
+        redbiom.admin.create_context('test', 'foo')
+        self.assertTrue(context_flag('test', 'db-version'))
+        self.assertFalse(context_flag('test', 'has-taxonomy'))
+
+        # a flag set since the state was obtained is observed
+        post = make_post(config)
+        post('test', 'HSET', 'state/has-taxonomy/1')
+        self.assertTrue(context_flag('test', 'has-taxonomy'))
+        self.assertIn('has-taxonomy', context_state('test'))
+
+    def test_state_bootstrap(self):
+        redbiom.admin.create_context('test', 'foo')
+        se = make_script_exec(config)
+        sha = redbiom.admin.ScriptManager.get('bootstrap-state')
+        contexts, scripts, states = se(sha, 0)
+        self.assertEqual(contexts, {'test': 'foo'})
+        self.assertEqual(scripts['bootstrap-state'], sha)
+        self.assertEqual(states['test']['db-version'], redbiom.__db_version__)
+
+    def test_make_script_exec_noscript(self):
+        redbiom.admin.create_context('test', 'foo')
+        redbiom.admin.ScriptManager.load_scripts(read_only=False)
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.load_sample_data(table, 'test', tag=None)
+        se = make_script_exec(config)
+        sha = redbiom.admin.ScriptManager.get('fetch-sample')
+        sample = 'UNTAGGED_%s' % table.ids()[0]
+        exp = se(sha, 0, 'test', sample)
+
+        # the script is loaded again if Redis no longer holds it
+        requests.get(config['hostname'] + '/SCRIPT/FLUSH')
+        self.assertEqual(se(sha, 0, 'test', sample), exp)
+
     def test_parse_valid_request(self):
         context = 'test'
         redbiom.admin.create_context(context, 'foo')
@@ -90,6 +149,46 @@ class RequestsTests(unittest.TestCase):
         obs = get('metadata', 'HGET', 'category:BODY_SITE/10317.000033804')
         self.assertEqual(obs, exp)
 
+    def test_make_get_cached(self):
+        cache_dir = tempfile.mkdtemp()
+        os.environ['REDBIOM_CACHE_DIR'] = cache_dir
+        os.environ['REDBIOM_HTTP_CACHE_SIZE'] = '1'
+        try:
+            post = make_post(config)
+            post('test', 'SET', 'foo/10')
+            self.assertEqual(make_get(config)('test', 'GET', 'foo'), '10')
+
+            # the cached response is used within a generation
+            post('test', 'SET', 'foo/20')
+            self.assertEqual(make_get(config)('test', 'GET', 'foo'), '10')
+            self.assertEqual(make_get(config, cache=False)('test', 'GET',
+                                                           'foo'), '20')
+
+            # a getter retains the generation of its first request
+            get = make_get(config)
+            self.assertEqual(get('test', 'GET', 'foo'), '10')
+            post('state', 'INCR', 'generation')
+            self.assertEqual(get('test', 'GET', 'foo'), '10')
+            self.assertEqual(make_get(config)('test', 'GET', 'foo'), '20')
+
+            # responses are not shared across hosts, here the same server
+            # under another name
+            post('test', 'SET', 'foo/30')
+            host = os.environ.get('REDBIOM_HOST')
+            os.environ['REDBIOM_HOST'] = \
+                config['hostname'].replace('127.0.0.1', 'localhost')
+            try:
+                self.assertEqual(make_get(config)('test', 'GET', 'foo'), '30')
+            finally:
+                if host is None:
+                    del os.environ['REDBIOM_HOST']
+                else:
+                    os.environ['REDBIOM_HOST'] = host
+        finally:
+            del os.environ['REDBIOM_CACHE_DIR']
+            del os.environ['REDBIOM_HTTP_CACHE_SIZE']
+            shutil.rmtree(cache_dir)
+
     def test_make_put(self):
         put = make_put(config)
 
@@ -97,6 +196,21 @@ class RequestsTests(unittest.TestCase):
         obs = put('test', 'SET', 'bar', '1234')
         self.assertEqual(obs, exp)
 
+    def test_make_bulk_post(self):
+        redbiom.admin.ScriptManager.load_scripts(read_only=False)
+        bulk_post = make_bulk_post(config, max_args=8)
+        get = make_get(config)
+
+        members = ['a', 'b', 'c', 'd', 'e']
+        pairs = ['x', '1', 'y', '2', 'z', '3']
+        bulk_post('test', [('SADD', 'foo', members),
+                           ('HMSET', 'bar', pairs),
+                           ('SADD', 'baz', ['f'])])
+        self.assertEqual(sorted(get('test', 'SMEMBERS', 'foo')), members)
+        self.assertEqual(get('test', 'HGETALL', 'bar'),
+                         {'x': '1', 'y': '2', 'z': '3'})
+        self.assertEqual(get('test', 'SMEMBERS', 'baz'), ['f'])
+
     def test_buffered_not_multi(self):
         context = 'test'
         redbiom.admin.create_context(context, 'foo')
@@ -75,6 +75,22 @@ class SearchTests(unittest.TestCase):
 
         # TODO: return dataframes
 
+    def test_metadata_full_count(self):
+        redbiom.admin.ScriptManager.load_scripts(read_only=True)
+        tests = ['ab', 'antibiotics', 'antibiotics & NY', 'antibiotics - NY',
+                 '(antibiotics | NY) - MA',
+                 'antibiotics where AGE_CAT in ("20s","30s")']
+        for test in tests:
+            exp = len(redbiom.search.metadata_full(test))
+            obs = redbiom.search.metadata_full_count(test)
+            self.assertEqual(obs, exp)
+
+        exp = len(redbiom.search.metadata_full('disease - liver',
+                                               categories=True))
+        obs = redbiom.search.metadata_full_count('disease - liver',
+                                                 categories=True)
+        self.assertEqual(obs, exp)
+
     def test_metadata_values_fail(self):
         tests = [('antibiotics and NY', TypeError, "Unsupported node type"),
                  ('NY where age & bmi', TypeError,
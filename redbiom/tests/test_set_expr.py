@@ -1,6 +1,6 @@
 import unittest
 
-from redbiom.set_expr import seteval
+from redbiom.set_expr import seteval, to_postfix
 
 
 mock_db = {'W': {1, 2},
@@ -50,6 +50,25 @@ class SetTests(unittest.TestCase):
             obs = seteval(test, get=mock_get)
             self.assertEqual(obs, exp)
 
+    def test_to_postfix(self):
+        tests = [("X", ['k:X']),
+                 ("X & Y", ['k:X', 'k:Y', 'o:and']),
+                 ("(W ^ X) | Y", ['k:W', 'k:X', 'o:xor', 'k:Y', 'o:or']),
+                 ("W - (X | Z)", ['k:W', 'k:X', 'k:Z', 'o:or', 'o:sub'])]
+        for test, exp in tests:
+            self.assertEqual(to_postfix(test), exp)
+
+    def test_to_postfix_bad_types(self):
+        tests = ["A & 10",
+                 "print('hi')",
+                 "A + B"]
+        for test in tests:
+            with self.assertRaises(TypeError):
+                to_postfix(test)
+
+        with self.assertRaises(SyntaxError):
+            to_postfix("(A & B")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,4 +1,7 @@
 import unittest
+import os
+import shutil
+import tempfile
 import requests
 
 import biom
@@ -8,7 +11,8 @@ import pandas.util.testing as pdt
 import redbiom
 import redbiom.admin
 import redbiom._requests
-from redbiom.summarize import contexts
+from redbiom.summarize import (contexts, table as summarize_table,
+                               category_from_features, taxonomy)
 from redbiom.tests import assert_test_env
 
 assert_test_env()
@@ -86,6 +90,115 @@ class SummarizeTests(unittest.TestCase):
         exp = exp.sort_values('ContextName').set_index('ContextName')
         pdt.assert_frame_equal(obs, exp)
 
+    def test_summarize_contexts_cached(self):
+        cache_dir = tempfile.mkdtemp()
+        os.environ['REDBIOM_CACHE_DIR'] = cache_dir
+        os.environ['REDBIOM_HTTP_CACHE_SIZE'] = '1'
+        try:
+            redbiom.admin.create_context('test', 'foo')
+            redbiom.admin.load_sample_metadata(metadata)
+            redbiom.admin.ScriptManager.load_scripts(read_only=False)
+            exp = pd.DataFrame([('test', 0, 0, 'foo')],
+                               columns=['ContextName', 'SamplesWithData',
+                                        'FeaturesWithData', 'Description'])
+            obs = contexts()
+            pdt.assert_frame_equal(obs, exp)
+
+            # the cached detail is reused within a generation, which a direct
+            # modification does not change
+            post = redbiom._requests.make_post(redbiom.get_config())
+            post('test', 'SADD', 'samples-represented/foo')
+            obs = contexts()
+            pdt.assert_frame_equal(obs, exp)
+
+            # and is invalidated by a load
+            redbiom.admin.load_sample_data(table, 'test', tag=None)
+            ndat = len(table.ids()) + 1
+            nfeat = len(table.ids(axis='observation'))
+            exp = pd.DataFrame([('test', ndat, nfeat, 'foo')],
+                               columns=['ContextName', 'SamplesWithData',
+                                        'FeaturesWithData', 'Description'])
+            obs = contexts()
+            pdt.assert_frame_equal(obs, exp)
+
+            # and when the contexts change
+            redbiom.admin.create_context('test', 'bar')
+            exp['Description'] = ['bar']
+            obs = contexts()
+            pdt.assert_frame_equal(obs, exp)
+        finally:
+            del os.environ['REDBIOM_CACHE_DIR']
+            del os.environ['REDBIOM_HTTP_CACHE_SIZE']
+            shutil.rmtree(cache_dir)
+
+    def test_taxonomy(self):
+        lineages = [['k__a', 'p__b', 'c__c'],
+                    ['k__a', 'p__b', 'c__d'],
+                    ['k__a', 'p__', 'c__c'],
+                    ['k__a', 'p__b', 'c__c']]
+        exp = pd.DataFrame([('c__c', 1, 0.25),
+                            ('c__c', 2, 0.5),
+                            ('c__d', 1, 0.25),
+                            ('p__b', 3, 0.75),
+                            ('k__a', 4, 1.0)],
+                           columns=['Taxon', 'Count', 'FractionOfInput'])
+        obs = taxonomy(lineages)
+        pdt.assert_frame_equal(obs, exp)
+
+        obs = taxonomy([])
+        self.assertEqual(len(obs), 0)
+
+    def test_table(self):
+        redbiom.admin.create_context('test', 'foo')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.ScriptManager.load_scripts(read_only=False)
+        redbiom.admin.load_sample_data(table, 'test', tag=None)
+
+        features = list(table.ids(axis='observation')[:10]) + ['missing']
+        obs = summarize_table('test', 'SIMPLE_BODY_SITE', features)
+        self.assertEqual(list(obs.index), features)
+
+        for feature in features:
+            exp = category_from_features('test', 'SIMPLE_BODY_SITE',
+                                         [feature], False).value_counts()
+            exp = exp[exp > 0]
+            row = obs.loc[feature]
+            row = row[row > 0]
+            self.assertEqual(dict(row), dict(exp))
+
+    def test_table_duplicated_entry(self):
+        redbiom.admin.create_context('test', 'foo')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.ScriptManager.load_scripts(read_only=False)
+        redbiom.admin.load_sample_data(table, 'test', tag=None)
+
+        features = list(table.ids(axis='observation')[:10])
+        exp = summarize_table('test', 'SIMPLE_BODY_SITE', features)
+
+        # list a sample of a feature twice
+        key = 'feature:%s' % features[0]
+        index, count = self.get('test', 'LRANGE', '%s/0/1' % key)
+        post = redbiom._requests.make_post(redbiom.get_config())
+        post('test', 'RPUSH', '%s/%s/%s' % (key, index, count))
+
+        obs = summarize_table('test', 'SIMPLE_BODY_SITE', features)
+        pdt.assert_frame_equal(obs, exp)
+
+    def test_table_jobs(self):
+        redbiom.admin.create_context('test', 'foo')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.ScriptManager.load_scripts(read_only=False)
+        redbiom.admin.load_sample_data(table, 'test', tag=None)
+
+        features = list(table.ids(axis='observation'))
+        exp = summarize_table('test', 'SIMPLE_BODY_SITE', features)
+
+        completed = []
+        obs = summarize_table('test', 'SIMPLE_BODY_SITE', features, jobs=2,
+                              chunk_size=7, progress=completed.append)
+        pdt.assert_frame_equal(obs, exp)
+        self.assertEqual(sum(completed), len(features))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import sys
+import types
+
+import pandas as pd
+
+import redbiom.admin
+from redbiom.nightly.updater import gather_ids_tags_contexts_paths
+
+
+class Namespace(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def make_artifact(id_, visibility='public'):
+    trimming = Namespace(command=Namespace(name='Trimming'),
+                         values={'length': 150})
+    deblur = Namespace(command=Namespace(name='Deblur'))
+    parent = Namespace(processing_parameters=trimming)
+    prep = Namespace(to_dataframe=lambda: pd.DataFrame())
+    return Namespace(id=id_, visibility=visibility, artifact_type='BIOM',
+                     processing_parameters=deblur, prep_templates=[prep],
+                     parents=[parent],
+                     filepaths=[(1, '/%d/reference-hit.biom' % id_, 'biom'),
+                                (2, '/%d/all.biom' % id_, 'biom')])
+
+
+def make_study(id_, artifacts, sample_template=True):
+    return Namespace(id=id_, artifacts=lambda: artifacts,
+                     sample_template=object() if sample_template else None)
+
+
+class UpdaterTests(unittest.TestCase):
+    def setUp(self):
+        self.studies = [make_study(1, [make_artifact(10),
+                                       make_artifact(11, 'private')]),
+                        make_study(2, [make_artifact(20)],
+                                   sample_template=False),
+                        make_study(3, [])]
+
+        info = {'platform': 'Illumina', 'target_subfragment': ['V4'],
+                'target_gene': '16S rRNA', 'deprecated': False,
+                'parameters': {}, 'algorithm': 'Deblur (x)',
+                'algorithm_az': 'abcdef0123'}
+
+        qiita_db = types.ModuleType('qiita_db')
+        qiita_db.study = types.ModuleType('qiita_db.study')
+        qiita_db.util = types.ModuleType('qiita_db.util')
+        qiita_db.study.Study = Namespace(
+            get_by_status=lambda status: self.studies)
+        qiita_db.util.get_artifacts_information = lambda ids: [info]
+
+        self.modules = {'qiita_db': qiita_db,
+                        'qiita_db.study': qiita_db.study,
+                        'qiita_db.util': qiita_db.util}
+        self.saved = {name: sys.modules.get(name) for name in self.modules}
+        sys.modules.update(self.modules)
+
+        self.contexts = []
+        self.create_context = redbiom.admin.create_context
+        redbiom.admin.create_context = \
+            lambda name, desc: self.contexts.append((name, desc))
+
+    def tearDown(self):
+        redbiom.admin.create_context = self.create_context
+        for name, module in self.saved.items():
+            if module is None:
+                del sys.modules[name]
+            else:
+                sys.modules[name] = module
+
+    def test_gather_ids_tags_contexts_paths(self):
+        context = 'Deblur-Illumina-16S-V4-150nt-abcdef'
+        exp = [(1, '10', context, '/10/reference-hit.biom')]
+        obs = gather_ids_tags_contexts_paths(jobs=1)
+        self.assertEqual(obs, exp)
+        self.assertEqual(self.contexts, [(context, 'Deblur (x)')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,7 @@ import biom
 import redbiom
 import redbiom.admin
 from redbiom.util import (float_or_nan, from_or_nargs,
-                          ids_from, has_sample_metadata,
+                          ids_from, count_from, has_sample_metadata,
                           partition_samples_by_tags, resolve_ambiguities,
                           _stable_ids_from_ambig, _stable_ids_from_unambig,
                           category_exists, df_to_stems, stems)
@@ -141,6 +141,43 @@ class UtilTests(unittest.TestCase):
         obs = ids_from(to_fetch, False, 'sample', ['test'])
         self.assertEqual(obs, exp)
 
+    def test_ids_from_samples_filter(self):
+        redbiom.admin.create_context('test', 'foo')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.ScriptManager.load_scripts(read_only=False)
+        redbiom.admin.load_sample_data(table, 'test', tag=None)
+
+        obs_ids = table.ids(axis='observation')
+        exp = set(obs_ids[table.data(table.ids()[0]) >= 10])
+        to_fetch = ['UNTAGGED_%s' % table.ids()[0]]
+        obs = ids_from(to_fetch, False, 'sample', ['test'], min_count=10)
+        self.assertEqual(obs, exp)
+
+    def test_count_from(self):
+        redbiom.admin.create_context('test', 'foo')
+        redbiom.admin.load_sample_metadata(metadata)
+        redbiom.admin.ScriptManager.load_scripts(read_only=False)
+        redbiom.admin.load_sample_data(table, 'test', tag=None)
+
+        ids = list(table.ids(axis='observation'))
+        for exact in (True, False):
+            for min_count in (1, 3):
+                exp = len(ids_from(ids[:5], exact, 'feature', ['test'],
+                                   min_count))
+                obs = count_from(ids[:5], exact, 'feature', ['test'],
+                                 min_count)
+                self.assertEqual(obs, exp)
+
+                # force the results to be combined over multiple blocks
+                obs = count_from(ids[:5], exact, 'feature', ['test'],
+                                 min_count, buffer_size=2)
+                self.assertEqual(obs, exp)
+
+        to_fetch = ['UNTAGGED_%s' % i for i in table.ids()[:2]]
+        exp = len(ids_from(to_fetch, False, 'sample', ['test']))
+        self.assertEqual(count_from(to_fetch, False, 'sample', ['test']), exp)
+        self.assertEqual(count_from([], False, 'sample', ['test']), 0)
+
     def test_has_sample_metadata(self):
         redbiom.admin.create_context('test', 'foo')
         redbiom.admin.load_sample_metadata(metadata)
@@ -45,7 +45,9 @@ def ids_from(it, exact, axis, contexts, min_count=1):
     contexts : list of str
         The contexts to search in
     min_count : int, optional
-        The minimum count (inclusive) to retain an observation.
+        The minimum count (inclusive) to retain an observation. The filter is
+        applied server-side so entries below the threshold are not resolved
+        or transferred.
 
     Notes
     -----
@@ -72,15 +74,12 @@ def ids_from(it, exact, axis, contexts, min_count=1):
     if not isinstance(contexts, (list, set, tuple)):
         contexts = [contexts]
 
-    def min_count_filter(dat):
-        return {k: v for k, v in dat.items() if v >= min_count}
-
     it = list(it)
     fetcher = redbiom.admin.ScriptManager.get('fetch-%s' % axis)
     for context in contexts:
         context_ids = None
         for id_ in it:
-            block = min_count_filter(se(fetcher, 0, context, id_))
+            block = se(fetcher, 0, context, id_, min_count)
             if not exact:
                 if context_ids is None:
                     context_ids = set()
@@ -97,6 +96,84 @@ def ids_from(it, exact, axis, contexts, min_count=1):
     return retrieved
 
 
+def count_from(it, exact, axis, contexts, min_count=1, buffer_size=100):
+    """Count the IDs associated with an iterable of IDs
+
+    Parameters
+    ----------
+    it : iteraable of str
+        The IDs to search for
+    exact : boolean
+        If True, compute the intersection of results per context. If False,
+        compute the union of results per context.
+    axis : {'feature', 'sample'}
+        The axis to operate over.
+    contexts : list of str
+        The contexts to search in
+    min_count : int, optional
+        The minimum count (inclusive) to retain an observation.
+    buffer_size : int, optional
+        The number of IDs to send per request.
+
+    Notes
+    -----
+    The result set is computed server-side over the internal indices, so the
+    associated IDs are neither resolved nor transferred. If more than
+    buffer_size IDs are provided, the indices of each block are returned and
+    combined locally.
+
+    Indices are specific to a context, so a search over multiple contexts
+    falls back to ids_from.
+
+    Returns
+    -------
+    int
+        The number of IDs associated with the search IDs.
+
+    Redis command summary
+    ---------------------
+    EVALSHA <count-from-sha1> 0 <context> <axis> <min_count> <exact> ...
+    """
+    import redbiom
+    import redbiom._requests
+    import redbiom.admin
+
+    if axis not in {'feature', 'sample'}:
+        raise ValueError("Unknown axis: %s" % axis)
+
+    if not isinstance(contexts, (list, set, tuple)):
+        contexts = [contexts]
+
+    if len(contexts) != 1:
+        return len(ids_from(it, exact, axis, contexts, min_count))
+
+    context = list(contexts)[0]
+    it = [i.strip() for i in it]
+    if not it:
+        return 0
+
+    config = redbiom.get_config()
+    se = redbiom._requests.make_script_exec(config)
+    counter = redbiom.admin.ScriptManager.get('count-from')
+
+    if len(it) <= buffer_size:
+        return int(se(counter, 0, context, axis, min_count, int(exact), 0,
+                      *it))
+
+    indices = None
+    for start in range(0, len(it), buffer_size):
+        block = set(se(counter, 0, context, axis, min_count, int(exact), 1,
+                       *it[start:start + buffer_size]))
+        if indices is None:
+            indices = block
+        elif exact:
+            indices &= block
+        else:
+            indices |= block
+
+    return len(indices)
+
+
 def category_exists(category, get=None):
     """Test if a category exists
 
@@ -135,8 +212,12 @@ def float_or_nan(t):
         return np.nan
 
 
-def has_sample_metadata(samples, get=None):
-    """Test if all samples have sample metadata"""
+def has_sample_metadata(samples, get=None, represented=None):
+    """Test if all samples have sample metadata
+
+    The samples with metadata are obtained from Redis unless a set of them
+    is provided as represented.
+    """
     import redbiom._requests
     if get is None:
         import redbiom
@@ -146,7 +227,8 @@ def has_sample_metadata(samples, get=None):
     untagged, tagged, _, tagged_clean = partition_samples_by_tags(samples)
 
     # make sure all samples have metadata
-    represented = set(get('metadata', 'SMEMBERS', 'samples-represented'))
+    if represented is None:
+        represented = set(get('metadata', 'SMEMBERS', 'samples-represented'))
     if not set(untagged).issubset(represented):
         return False
     if not set(tagged_clean).issubset(represented):
@@ -41,6 +41,13 @@ echo "UNTAGGED_10317.000046868" >> ${exp}
 redbiom search features --context test ${query} | sort - > ${obs}
 md5test ${obs} ${exp}
 
+# verify the server-side count agrees with the number of samples
+obs_count=$(redbiom search features --count --context test ${query})
+if [[ "${obs_count}" != "3" ]]; then
+    echo "Failed"
+    exit 1
+fi
+
 # verify we're getting the expected samples back for a simple query when going via a pipe
 echo ${query} | redbiom search features --context test | sort - > ${obs}
 md5test ${obs} ${exp}